@@ -1,5 +1,6 @@
 # This file should be used to store configuration and secrets securely.
 # Never commit real secrets to source control!
+import json
 import os
 
 # Best Practice: Load secrets from environment variables, not hardcoded values.
@@ -13,3 +14,16 @@ if not SUPABASE_URL or not SUPABASE_KEY:
         "export SUPABASE_URL='your_supabase_url'\n"
         "export SUPABASE_KEY='your_supabase_key'"
     )
+
+# Tenant (household/portfolio) used when none is given explicitly.
+DEFAULT_TENANT_ID = os.getenv("DEFAULT_TENANT_ID", "default")
+
+# With Streamlit authentication configured, each signed-in user gets the tenant
+# named by their email, or a shared one via a JSON map, e.g.
+# export TENANT_BY_EMAIL='{"a@example.com": "smith", "b@example.com": "smith"}'
+TENANT_BY_EMAIL = json.loads(os.getenv("TENANT_BY_EMAIL", "{}"))
+# Ask anonymous visitors to log in instead of serving DEFAULT_TENANT_ID.
+REQUIRE_LOGIN = os.getenv("REQUIRE_LOGIN", "").lower() in ("1", "true", "yes")
+# Honour ?tenant=... for anonymous visitors. Trackers are NOT isolated in this
+# mode: anyone who edits the URL can read and change another tenant's data.
+ALLOW_TENANT_QUERY_PARAM = os.getenv("ALLOW_TENANT_QUERY_PARAM", "").lower() in ("1", "true", "yes")
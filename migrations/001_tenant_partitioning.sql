@@ -0,0 +1,11 @@
+-- Multi-tenant partitioning of financial_data and prediction_rules.
+-- Run once in the Supabase SQL editor. Existing rows are assigned to the
+-- 'default' tenant (matches DEFAULT_TENANT_ID in app_config.py).
+
+ALTER TABLE financial_data ADD COLUMN IF NOT EXISTS tenant_id text NOT NULL DEFAULT 'default';
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS tenant_id text NOT NULL DEFAULT 'default';
+
+-- Every read is "WHERE tenant_id = ?" (financial_data is also ordered by date),
+-- and every save deletes by tenant_id, so lead each index with the tenant key.
+CREATE INDEX IF NOT EXISTS financial_data_tenant_date_idx ON financial_data (tenant_id, date);
+CREATE INDEX IF NOT EXISTS prediction_rules_tenant_idx ON prediction_rules (tenant_id);
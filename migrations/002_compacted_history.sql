@@ -0,0 +1,33 @@
+-- Compacted snapshot history: periodic full checkpoints plus per-account deltas.
+-- Filled by compaction.compact_history(); read back by compaction.load_snapshot_history().
+
+CREATE TABLE IF NOT EXISTS financial_checkpoints (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    tenant_id text NOT NULL DEFAULT 'default',
+    seq bigint NOT NULL,
+    date text NOT NULL,
+    "HDFC (₹)" double precision NOT NULL DEFAULT 0,
+    "ICICI (₹)" double precision NOT NULL DEFAULT 0,
+    "SBI (₹)" double precision NOT NULL DEFAULT 0,
+    "SBI Overdraft (₹)" double precision NOT NULL DEFAULT 0,
+    "OP (₹)" double precision NOT NULL DEFAULT 0,
+    "Grow Stock (₹)" double precision NOT NULL DEFAULT 0,
+    "Grow Mutual Funds (₹)" double precision NOT NULL DEFAULT 0,
+    "Need to get" double precision NOT NULL DEFAULT 0,
+    "Credit card+ other exp" double precision NOT NULL DEFAULT 0,
+    "Total (₹)" double precision NOT NULL DEFAULT 0,
+    "OP (Euro)" double precision NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS financial_deltas (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    tenant_id text NOT NULL DEFAULT 'default',
+    seq bigint NOT NULL,
+    date text NOT NULL,
+    account text NOT NULL,
+    delta double precision NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS financial_checkpoints_tenant_seq_idx ON financial_checkpoints (tenant_id, seq);
+CREATE INDEX IF NOT EXISTS financial_checkpoints_tenant_date_idx ON financial_checkpoints (tenant_id, date);
+CREATE INDEX IF NOT EXISTS financial_deltas_tenant_seq_idx ON financial_deltas (tenant_id, seq);
@@ -0,0 +1,10 @@
+-- Rich schedules for prediction rules (see src/recurrence.py).
+-- All columns are optional; NULL keeps the original "day D of every month /
+-- day D of month M" behaviour.
+
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS frequency text;      -- monthly | weekly | biweekly | every_n_months
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS interval integer;    -- N months / N weeks
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS day_type text;       -- fixed | last | last_business
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS weekday integer;     -- 0 = Monday .. 6 = Sunday
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS start_date text;     -- YYYY-MM-DD
+ALTER TABLE prediction_rules ADD COLUMN IF NOT EXISTS end_date text;       -- YYYY-MM-DD
@@ -0,0 +1,9 @@
+-- Record which financial_data row each compacted snapshot came from, so
+-- compaction can skip rows it already wrote (see compaction.compact_history()).
+-- Rows compacted before this migration keep a NULL source_id.
+
+ALTER TABLE financial_checkpoints ADD COLUMN IF NOT EXISTS source_id text;
+ALTER TABLE financial_deltas ADD COLUMN IF NOT EXISTS source_id text;
+
+CREATE INDEX IF NOT EXISTS financial_checkpoints_tenant_source_idx ON financial_checkpoints (tenant_id, source_id);
+CREATE INDEX IF NOT EXISTS financial_deltas_tenant_source_idx ON financial_deltas (tenant_id, source_id);
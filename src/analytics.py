@@ -0,0 +1,112 @@
+# Rolling analytics over snapshot history and downsampling for charts
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from compaction import BALANCE_COLUMNS
+
+# Maximum number of points sent to the browser per chart series
+CHART_POINT_BUDGET = 500
+
+def _daily_frame(snapshots):
+    # One row per date (last snapshot of the day), indexed by date
+    frame = snapshots.copy()
+    frame['Date'] = pd.to_datetime(frame['Date'])
+    frame = frame.drop_duplicates('Date', keep='last').set_index('Date').sort_index()
+    return frame[BALANCE_COLUMNS].astype(float)
+
+def compute_rolling_metrics(snapshots, window_days=30):
+    # Per account and date: moving average, burn rate (average decrease per
+    # day) and volatility (std of per-snapshot changes) over a time-based
+    # window of `window_days`. Snapshots need not be evenly spaced.
+    frame = _daily_frame(snapshots)
+    window = f'{window_days}D'
+    changes = frame.diff()
+    elapsed_days = frame.index.to_series().diff().dt.days
+    moving_average = frame.rolling(window).mean()
+    days_in_window = elapsed_days.rolling(window).sum()
+    burn_rate = -changes.rolling(window).sum().div(days_in_window, axis=0)
+    volatility = changes.rolling(window).std()
+    metrics = pd.concat(
+        {'moving_average': moving_average, 'burn_rate': burn_rate, 'volatility': volatility}, axis=1
+    )
+    metrics.columns.names = ['metric', 'account']
+    return metrics
+
+def update_rolling_metrics(metrics, snapshots, window_days=30):
+    # Extends previously computed metrics with snapshots added since, only
+    # recomputing over the new rows plus one window of lookback. The lookback
+    # starts at the last snapshot at or before the window start, so the first
+    # change inside the window has its previous value.
+    if metrics is None or metrics.empty:
+        return compute_rolling_metrics(snapshots, window_days)
+    last_date = metrics.index.max()
+    dates = pd.to_datetime(snapshots['Date'])
+    before_window = dates[dates <= last_date - pd.Timedelta(days=window_days)]
+    tail = snapshots[dates >= before_window.max()] if not before_window.empty else snapshots
+    fresh = compute_rolling_metrics(tail, window_days)
+    fresh = fresh[fresh.index > last_date]
+    return pd.concat([metrics, fresh])
+
+def month_over_month(snapshots):
+    # Month-end net worth with absolute and relative change from the prior month
+    totals = _daily_frame(snapshots)['Total (₹)'].resample('ME').last().dropna()
+    return pd.DataFrame({
+        'Total (₹)': totals,
+        'Change (₹)': totals.diff(),
+        'Change (%)': totals.pct_change() * 100,
+    })
+
+def lttb(x, y, n_out=CHART_POINT_BUDGET):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, for
+    # each bucket in between, the point forming the largest triangle with the
+    # previously kept point and the average of the next bucket.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Averages of every bucket, used as the third triangle corner
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[previous] - avg_x[i + 1]) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y[i + 1] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+def minmax_downsample(y, n_out=CHART_POINT_BUDGET):
+    # Keeps the minimum and maximum of each of n_out / 2 equal buckets
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    order = np.lexsort((y, bucket))
+    firsts = order[edges[:-1]]
+    lasts = order[edges[1:] - 1]
+    return np.unique(np.concatenate([firsts, lasts]))
+
+def downsample_series(series, n_out=CHART_POINT_BUDGET, method='lttb'):
+    # Downsamples a date-indexed series to at most n_out points for plotting
+    series = series.dropna()
+    if method == 'minmax':
+        keep = minmax_downsample(series.to_numpy(), n_out)
+    else:
+        keep = lttb(series.index.asi8, series.to_numpy(), n_out)
+    return series.iloc[keep]
@@ -0,0 +1,166 @@
+# Headless command-line entry point for forecasts, exports, compaction and
+# forecast-vs-actual reconciliation.
+# Does not import Streamlit, so it can run from cron/CI:
+#   python src/cli.py forecast --tenant default --months 6
+#   python src/cli.py forecast --tenant a --tenant b --monthly --months 360 --output-dir out/
+#   python src/cli.py export --scenarios scenarios.json --workers 8
+# Prints one JSON result per job on stdout. Exit code is 0 if every job
+# succeeded, 1 if any job failed and 2 for invalid arguments.
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+EXIT_OK = 0
+EXIT_JOB_FAILED = 1
+EXIT_USAGE = 2
+
+def parse_growth_rates(values):
+    growth_rates = {}
+    for value in values or []:
+        account, _, rate = value.rpartition('=')
+        if not account:
+            raise ValueError(f"Invalid --growth value '{value}', expected ACCOUNT=RATE")
+        growth_rates[account] = float(rate)
+    return growth_rates
+
+def build_jobs(args):
+    # One job per tenant, or one per entry in the --scenarios JSON file.
+    # Scenario entries may override any of the job fields below.
+    defaults = {
+        'command': args.command,
+        'months': args.months,
+        'resolution': 'monthly' if args.monthly else 'daily',
+        'growth_rates': parse_growth_rates(args.growth),
+        'inflation_rate': args.inflation,
+        'format': args.format,
+        'output_dir': args.output_dir,
+        'keep_recent_days': args.keep_recent_days,
+        'checkpoint_every': args.checkpoint_every,
+        'downsample_before_days': args.downsample_before_days,
+        'tolerance_days': args.tolerance_days,
+        'state_dir': args.state_dir,
+    }
+    if args.scenarios:
+        with open(args.scenarios, 'r') as f:
+            scenarios = json.load(f)
+        if not isinstance(scenarios, list) or not all(isinstance(scenario, dict) for scenario in scenarios):
+            raise ValueError(f"{args.scenarios} must contain a JSON list of objects")
+    else:
+        scenarios = [{'tenant': tenant} for tenant in (args.tenant or [None])]
+    jobs = []
+    for i, scenario in enumerate(scenarios):
+        job = dict(defaults, **scenario)
+        job.setdefault('tenant', None)
+        job.setdefault('name', f"{job['tenant'] or 'default'}_{job['command']}_{i}")
+        jobs.append(job)
+    return jobs
+
+def _load_frame(tenant):
+    from data_manager import load_data
+    from compaction import to_snapshot_frame
+    return to_snapshot_frame(load_data(tenant))
+
+def _write_output(frame, job):
+    if not job['output_dir']:
+        return {'rows': len(frame), 'data': json.loads(frame.to_json(orient='records'))}
+    os.makedirs(job['output_dir'], exist_ok=True)
+    path = os.path.join(job['output_dir'], f"{job['name']}.{job['format']}")
+    if job['format'] == 'csv':
+        frame.to_csv(path, index=False)
+    elif job['format'] == 'xlsx':
+        frame.to_excel(path, index=False, engine='xlsxwriter')
+    else:
+        frame.to_json(path, orient='records', indent=2)
+    return {'rows': len(frame), 'output': path}
+
+def run_job(job):
+    # Runs in a worker process; never raises so one bad tenant does not
+    # abort the batch.
+    result = {'name': job['name'], 'tenant': job['tenant'], 'command': job['command']}
+    try:
+        if job['command'] in ('forecast', 'reconcile'):
+            # Rules with an invalid schedule are skipped; report them
+            from data_manager import load_prediction_rules
+            from recurrence import invalid_rules
+            problems = invalid_rules(load_prediction_rules(job['tenant']))
+            if problems:
+                result['warnings'] = [f"Rule {rule_id} skipped: {problem}" for rule_id, problem in problems.items()]
+        if job['command'] == 'forecast':
+            from data_manager import load_prediction_rules
+            from prediction import generate_future_events
+            frame = generate_future_events(
+                _load_frame(job['tenant']), months_ahead=job['months'],
+                rules=load_prediction_rules(job['tenant']), resolution=job['resolution'],
+                growth_rates=job['growth_rates'], inflation_rate=job['inflation_rate'],
+            )
+            result.update(_write_output(frame, job))
+        elif job['command'] == 'export':
+            # Full history, including snapshots moved out by `compact`
+            from compaction import load_snapshot_history
+            result.update(_write_output(load_snapshot_history(tenant_id=job['tenant']), job))
+        elif job['command'] == 'compact':
+            from compaction import compact_history
+            result['compacted_rows'] = compact_history(
+                job['tenant'], keep_recent_days=job['keep_recent_days'],
+                checkpoint_every=job['checkpoint_every'],
+                downsample_before_days=job['downsample_before_days'],
+            )
+        elif job['command'] == 'reconcile':
+            from reconciliation import run_reconciliation
+            report = run_reconciliation(job['tenant'], months_ahead=job['months'],
+                                        tolerance_days=job['tolerance_days'], state_dir=job['state_dir'])
+            result['report'] = {
+                name: json.loads(stats.rename_axis('key').reset_index().to_json(orient='records'))
+                for name, stats in report.items()
+            }
+        else:
+            raise ValueError(f"Unknown command '{job['command']}'")
+        result['status'] = 'ok'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless Financial Event Tracker batch runner")
+    parser.add_argument('command', choices=['forecast', 'export', 'compact', 'reconcile'])
+    parser.add_argument('--tenant', action='append', help="Tenant to process (repeatable)")
+    parser.add_argument('--scenarios', help="JSON file with a list of job overrides, e.g. [{\"tenant\": \"a\", \"months\": 24}]")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Process pool size (default: all cores)")
+    parser.add_argument('--months', type=int, default=3, help="Months ahead to forecast")
+    parser.add_argument('--monthly', action='store_true', help="Monthly long-horizon resolution")
+    parser.add_argument('--growth', action='append', metavar='ACCOUNT=RATE', help="Annual growth rate, e.g. 'Grow Stock (₹)=0.12'")
+    parser.add_argument('--inflation', type=float, default=0.0, help="Annual inflation applied to rule amounts")
+    parser.add_argument('--format', choices=['json', 'csv', 'xlsx'], default='json', help="File format with --output-dir")
+    parser.add_argument('--output-dir', help="Write one file per job here instead of embedding rows in stdout")
+    parser.add_argument('--keep-recent-days', type=int, default=90)
+    parser.add_argument('--checkpoint-every', type=int, default=30)
+    parser.add_argument('--downsample-before-days', type=int, default=None)
+    parser.add_argument('--tolerance-days', type=int, default=3, help="Reconcile: max days between a predicted event and the snapshot it is matched to")
+    parser.add_argument('--state-dir', help="Reconcile: directory for per-tenant state files (default: $RECONCILIATION_STATE_DIR or reconciliation_state/ in the repo)")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        jobs = build_jobs(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if len(jobs) == 1 or args.workers <= 1:
+        return _report(run_job(job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as executor:
+        return _report(executor.map(run_job, jobs))
+
+def _report(results):
+    failed = False
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+        failed = failed or result['status'] != 'ok'
+    return EXIT_JOB_FAILED if failed else EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# Handles compaction of old snapshot history into checkpoints + per-account deltas
+import pandas as pd
+from datetime import date, timedelta
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data_manager import (load_data, delete_data, load_history, save_history, delete_history,
+                          get_max_history_seq, get_latest_history_date, get_compacted_source_ids)
+
+# The eleven balance columns stored on every snapshot row
+BALANCE_COLUMNS = [
+    'HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 'OP (₹)', 'Grow Stock (₹)',
+    'Grow Mutual Funds (₹)', 'Need to get', 'Credit card+ other exp', 'Total (₹)', 'OP (Euro)'
+]
+
+# Account used to record a snapshot whose balances did not change at all, so
+# that its date survives compaction (stored as a zero delta).
+NO_CHANGE_MARKER = 'Total (₹)'
+
+def to_snapshot_frame(data, with_source_id=False):
+    # Normalise raw rows (as returned by load_data) into a date-sorted numeric
+    # frame; with_source_id keeps each row's id as 'source_id'
+    columns = ['Date'] + (['source_id'] if with_source_id else []) + BALANCE_COLUMNS
+    df = pd.DataFrame(data)
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    for col in BALANCE_COLUMNS:
+        if col not in df.columns:
+            df[col] = 0.0
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0).astype(float)
+    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    df['source_id'] = df['id'] if 'id' in df.columns else None
+    return df.sort_values('Date', kind='stable').reset_index(drop=True)[columns]
+
+def downsample_monthly(df):
+    # Keep only the last snapshot of each calendar month
+    if df.empty:
+        return df
+    month = df['Date'].str[:7]
+    return df[~month.duplicated(keep='last')].reset_index(drop=True)
+
+def compact_snapshots(df, checkpoint_every=30, start_seq=0):
+    # Split a date-sorted snapshot frame into full checkpoints (every
+    # `checkpoint_every` rows) and long-format per-account deltas for the rest.
+    # Returns (checkpoints, deltas); `seq` orders rows across both frames and
+    # 'source_id' (None if `df` has none) is carried onto every row.
+    if df.empty:
+        return (pd.DataFrame(columns=['seq', 'Date', 'source_id'] + BALANCE_COLUMNS),
+                pd.DataFrame(columns=['seq', 'Date', 'source_id', 'account', 'delta']))
+    df = df.reset_index(drop=True)
+    if 'source_id' not in df.columns:
+        df['source_id'] = None
+    seq = pd.RangeIndex(start_seq, start_seq + len(df))
+    is_checkpoint = (df.index % checkpoint_every) == 0
+
+    checkpoints = df.loc[is_checkpoint, ['Date', 'source_id'] + BALANCE_COLUMNS].copy()
+    checkpoints.insert(0, 'seq', seq[is_checkpoint])
+
+    diffs = df[BALANCE_COLUMNS].diff()
+    diffs.insert(0, 'source_id', df['source_id'])
+    diffs.insert(0, 'Date', df['Date'])
+    diffs.insert(0, 'seq', seq)
+    diffs = diffs[~is_checkpoint]
+    deltas = diffs.melt(id_vars=['seq', 'Date', 'source_id'], var_name='account', value_name='delta')
+    changed = deltas['delta'] != 0
+    # Snapshots with no change at all keep a single zero-delta marker row
+    unchanged = ~diffs[BALANCE_COLUMNS].ne(0).any(axis=1)
+    markers = diffs.loc[unchanged, ['seq', 'Date', 'source_id']].assign(account=NO_CHANGE_MARKER, delta=0.0)
+    deltas = pd.concat([deltas[changed], markers], ignore_index=True)
+    deltas = deltas.sort_values(['seq', 'account'], kind='stable').reset_index(drop=True)
+    return checkpoints.reset_index(drop=True), deltas
+
+def reconstruct_snapshots(checkpoints, deltas, start=None, end=None, with_source_id=False):
+    # Rebuild full snapshots from checkpoints + deltas with a cumulative sum
+    # per checkpoint segment. `checkpoints` must include the nearest checkpoint
+    # at or before `start`; rows outside [start, end] are dropped at the end.
+    # A source row written twice (a rebuild interrupted before the old range
+    # was deleted) is kept once, from its latest seq.
+    columns = ['Date'] + (['source_id'] if with_source_id else []) + BALANCE_COLUMNS
+    if checkpoints.empty:
+        return pd.DataFrame(columns=columns)
+    full = checkpoints.reindex(columns=['seq', 'Date', 'source_id'] + BALANCE_COLUMNS)
+    full['is_checkpoint'] = True
+    if not deltas.empty:
+        deltas = deltas.reindex(columns=['seq', 'Date', 'source_id', 'account', 'delta'])
+        wide = deltas.pivot_table(index='seq', columns='account', values='delta',
+                                  aggfunc='sum', fill_value=0.0)
+        wide = wide.reindex(columns=BALANCE_COLUMNS, fill_value=0.0)
+        wide = deltas.groupby('seq')[['Date', 'source_id']].first().join(wide).reset_index()
+        wide['is_checkpoint'] = False
+        wide = wide[wide['seq'] > full['seq'].min()]
+        full = pd.concat([full, wide], ignore_index=True)
+    full = full.sort_values('seq', kind='stable').reset_index(drop=True)
+    segment = full['is_checkpoint'].cumsum()
+    full[BALANCE_COLUMNS] = full[BALANCE_COLUMNS].astype(float).groupby(segment).cumsum()
+    full = full[~(full['source_id'].notna() & full['source_id'].duplicated(keep='last'))]
+    full = full.sort_values('Date', kind='stable')
+    if start is not None:
+        full = full[full['Date'] >= str(start)]
+    if end is not None:
+        full = full[full['Date'] <= str(end)]
+    return full[columns].reset_index(drop=True)
+
+def compact_history(tenant_id=None, keep_recent_days=90, checkpoint_every=30, downsample_before_days=None):
+    # Move snapshots older than `keep_recent_days` out of financial_data into the
+    # checkpoint/delta history tables. Snapshots older than
+    # `downsample_before_days` are reduced to one per month first.
+    data = load_data(tenant_id)
+    cutoff = (date.today() - timedelta(days=keep_recent_days)).strftime('%Y-%m-%d')
+    old_rows = [row for row in data if str(row.get('Date', '')) < cutoff]
+    if not old_rows:
+        return 0
+    # Rows already written by an earlier run (e.g. one that failed after
+    # save_history) are only trimmed from financial_data, never compacted twice
+    earliest = min(str(row.get('Date', '')) for row in old_rows)
+    compacted_ids = get_compacted_source_ids(tenant_id, since=earliest)
+    old = to_snapshot_frame([row for row in old_rows if row.get('id') not in compacted_ids], with_source_id=True)
+    if downsample_before_days is not None:
+        ancient_cutoff = (date.today() - timedelta(days=downsample_before_days)).strftime('%Y-%m-%d')
+        ancient = old[old['Date'] < ancient_cutoff]
+        old = pd.concat([downsample_monthly(ancient), old[old['Date'] >= ancient_cutoff]], ignore_index=True)
+    if not old.empty:
+        max_seq = get_max_history_seq(tenant_id)
+        latest_compacted = get_latest_history_date(tenant_id)
+        rebuild_from = None
+        if latest_compacted is not None and old['Date'].min() <= latest_compacted:
+            # Back-dated rows: rewrite the history from the checkpoint before the
+            # earliest of them, so seq order stays date order
+            checkpoints, deltas = load_history(start=old['Date'].min(), tenant_id=tenant_id)
+            rebuild_from = int(checkpoints['seq'].min())
+            existing = reconstruct_snapshots(checkpoints, deltas, with_source_id=True)
+            old = pd.concat([existing, old], ignore_index=True).sort_values('Date', kind='stable')
+        checkpoints, deltas = compact_snapshots(old, checkpoint_every=checkpoint_every, start_seq=max_seq + 1)
+        # Write history before removing anything so a failure never loses rows;
+        # the replaced range is deleted only once its rewrite is stored
+        save_history(checkpoints, deltas, tenant_id)
+        if rebuild_from is not None:
+            delete_history(rebuild_from, max_seq, tenant_id)
+    delete_data([row['id'] for row in old_rows], tenant_id)
+    return len(old_rows)
+
+def load_snapshot_history(start=None, end=None, tenant_id=None):
+    # Compacted history for [start, end] merged with the live financial_data
+    # rows, by date. Live rows that are also in the history (compacted by a run
+    # that failed before trimming them) are shown once.
+    checkpoints, deltas = load_history(start, end, tenant_id)
+    history = reconstruct_snapshots(checkpoints, deltas, start, end, with_source_id=True)
+    recent = to_snapshot_frame(load_data(tenant_id), with_source_id=True)
+    recent = recent[~recent['source_id'].isin(history['source_id'].dropna())]
+    if start is not None:
+        recent = recent[recent['Date'] >= str(start)]
+    if end is not None:
+        recent = recent[recent['Date'] <= str(end)]
+    combined = pd.concat([history, recent], ignore_index=True).sort_values('Date', kind='stable')
+    return combined[['Date'] + BALANCE_COLUMNS].reset_index(drop=True)
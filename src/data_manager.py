@@ -1,14 +1,65 @@
 from supabase import create_client, Client
+import pandas as pd
 import sys
 import os
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import app_config as config_module
 SUPABASE_URL = config_module.SUPABASE_URL
 SUPABASE_KEY = config_module.SUPABASE_KEY
+DEFAULT_TENANT_ID = config_module.DEFAULT_TENANT_ID
 from utils.utils import generate_uuid, load_json_file, save_json_file
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# --- Tenancy ---
+# Every row in financial_data and prediction_rules carries a tenant_id, and
+# every read/write below is scoped to a single tenant.
+TENANT_COLUMN = "tenant_id"
+
+def resolve_tenant(tenant_id=None):
+    return tenant_id or DEFAULT_TENANT_ID
+
+# Per-tenant read cache of loaded rows, keyed by (table, tenant_id). Entries
+# expire so writes made by other app instances are picked up. Writes never
+# replace a tenant's whole table from a (possibly stale) cached list: saves
+# upsert only the rows given and deletes remove rows by id.
+CACHE_TTL_SECONDS = 60
+_cache = {}
+
+def _cache_get(table, tenant_id):
+    entry = _cache.get((table, tenant_id))
+    if entry is None:
+        return None
+    stored_at, rows = entry
+    if time.monotonic() - stored_at > CACHE_TTL_SECONDS:
+        del _cache[(table, tenant_id)]
+        return None
+    return [dict(row) for row in rows]
+
+def _cache_set(table, tenant_id, rows):
+    _cache[(table, tenant_id)] = (time.monotonic(), [dict(row) for row in rows])
+
+def clear_cache(tenant_id=None):
+    if tenant_id is None:
+        _cache.clear()
+        return
+    for key in [key for key in _cache if key[1] == tenant_id]:
+        del _cache[key]
+
+# PostgREST caps each response at its max-rows setting, so larger reads are
+# fetched page by page until an empty page comes back.
+PAGE_SIZE = 1000
+
+def _select_all(build_query):
+    # `build_query` returns a fresh, consistently ordered query for each page
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + PAGE_SIZE - 1).execute().data
+        if not page:
+            return rows
+        rows.extend(page)
+
 # --- Financial Data ---
 def ensure_guids(data):
     changed = False
@@ -18,41 +69,166 @@ def ensure_guids(data):
             changed = True
     return changed
 
-def load_data():
-    response = supabase.table("financial_data").select("*").execute()
-    data = response.data
+def load_data(tenant_id=None):
+    tenant_id = resolve_tenant(tenant_id)
+    cached = _cache_get("financial_data", tenant_id)
+    if cached is not None:
+        return cached
+    # Oldest first (the app treats the last row as the latest entry); id keeps
+    # the order stable across pages
+    data = _select_all(lambda: supabase.table("financial_data").select("*")
+                       .eq(TENANT_COLUMN, tenant_id).order("date").order("id"))
     # Map 'date' to 'Date' for compatibility with the rest of the app
     for row in data:
         if 'date' in row:
             row['Date'] = row.pop('date')
+        row.pop(TENANT_COLUMN, None)
+    _cache_set("financial_data", tenant_id, data)
     return data
 
-def save_data(data):
-    supabase.table("financial_data").delete().not_.is_('id', None).execute()
+def save_data(data, tenant_id=None):
+    # Insert or update the given rows (matched by id); other rows are untouched
+    tenant_id = resolve_tenant(tenant_id)
+    rows_to_upsert = []
     for row in data:
         # Ensure id is present
         if not row.get("id"):
             row["id"] = generate_uuid()
         # Map 'Date' to 'date' for Supabase
-        row_to_insert = row.copy()
-        if 'Date' in row_to_insert:
-            row_to_insert['date'] = row_to_insert.pop('Date')
+        row_to_upsert = row.copy()
+        if 'Date' in row_to_upsert:
+            row_to_upsert['date'] = row_to_upsert.pop('Date')
         # Remove GUID if present (Supabase does not have a GUID column)
-        if 'GUID' in row_to_insert:
-            del row_to_insert['GUID']
-        supabase.table("financial_data").insert(row_to_insert).execute()
+        if 'GUID' in row_to_upsert:
+            del row_to_upsert['GUID']
+        row_to_upsert[TENANT_COLUMN] = tenant_id
+        rows_to_upsert.append(row_to_upsert)
+    if rows_to_upsert:
+        supabase.table("financial_data").upsert(rows_to_upsert).execute()
+    clear_cache(tenant_id)
+
+def delete_data(ids, tenant_id=None):
+    tenant_id = resolve_tenant(tenant_id)
+    if ids:
+        supabase.table("financial_data").delete().eq(TENANT_COLUMN, tenant_id).in_("id", list(ids)).execute()
+    clear_cache(tenant_id)
 
 # --- Prediction Rules ---
-def load_prediction_rules():
-    response = supabase.table("prediction_rules").select("*").execute()
-    return response.data
+def load_prediction_rules(tenant_id=None):
+    tenant_id = resolve_tenant(tenant_id)
+    cached = _cache_get("prediction_rules", tenant_id)
+    if cached is not None:
+        return cached
+    rules = _select_all(lambda: supabase.table("prediction_rules").select("*")
+                        .eq(TENANT_COLUMN, tenant_id).order("id"))
+    for rule in rules:
+        rule.pop(TENANT_COLUMN, None)
+    _cache_set("prediction_rules", tenant_id, rules)
+    return rules
 
-def save_prediction_rules(rules):
-    supabase.table("prediction_rules").delete().not_.is_('id', None).execute()
+def save_prediction_rules(rules, tenant_id=None):
+    # Insert or update the given rules (matched by id); other rules are untouched
+    tenant_id = resolve_tenant(tenant_id)
+    rules_to_upsert = []
     for rule in rules:
         if not rule.get("id"):
             rule["id"] = generate_uuid()
-        supabase.table("prediction_rules").insert(rule).execute()
+        rule_to_upsert = rule.copy()
+        rule_to_upsert[TENANT_COLUMN] = tenant_id
+        rules_to_upsert.append(rule_to_upsert)
+    if rules_to_upsert:
+        supabase.table("prediction_rules").upsert(rules_to_upsert).execute()
+    clear_cache(tenant_id)
+
+def delete_prediction_rules(ids, tenant_id=None):
+    tenant_id = resolve_tenant(tenant_id)
+    if ids:
+        supabase.table("prediction_rules").delete().eq(TENANT_COLUMN, tenant_id).in_("id", list(ids)).execute()
+    clear_cache(tenant_id)
+
+# --- Compacted History ---
+# Older snapshots live in financial_checkpoints (full rows) and
+# financial_deltas (one row per changed account), ordered by seq. source_id
+# is the id of the financial_data row each snapshot was compacted from.
+def get_max_history_seq(tenant_id=None):
+    tenant_id = resolve_tenant(tenant_id)
+    response = (supabase.table("financial_checkpoints").select("seq").eq(TENANT_COLUMN, tenant_id)
+                .order("seq", desc=True).limit(1).execute())
+    checkpoint_seq = response.data[0]["seq"] if response.data else -1
+    response = (supabase.table("financial_deltas").select("seq").eq(TENANT_COLUMN, tenant_id)
+                .order("seq", desc=True).limit(1).execute())
+    delta_seq = response.data[0]["seq"] if response.data else -1
+    return max(checkpoint_seq, delta_seq)
+
+def get_latest_history_date(tenant_id=None):
+    # Date of the newest compacted snapshot, or None if nothing is compacted yet
+    tenant_id = resolve_tenant(tenant_id)
+    dates = []
+    for table in ("financial_checkpoints", "financial_deltas"):
+        response = (supabase.table(table).select("date").eq(TENANT_COLUMN, tenant_id)
+                    .order("date", desc=True).limit(1).execute())
+        if response.data:
+            dates.append(response.data[0]["date"])
+    return max(dates) if dates else None
+
+def get_compacted_source_ids(tenant_id=None, since=None):
+    # ids of financial_data rows already written to the history tables,
+    # optionally only for snapshots dated on or after `since`
+    tenant_id = resolve_tenant(tenant_id)
+    source_ids = set()
+    for table in ("financial_checkpoints", "financial_deltas"):
+        def build_query(table=table):
+            query = (supabase.table(table).select("source_id").eq(TENANT_COLUMN, tenant_id)
+                     .not_.is_("source_id", "null"))
+            if since is not None:
+                query = query.gte("date", str(since))
+            return query.order("id")
+        source_ids.update(row["source_id"] for row in _select_all(build_query))
+    return source_ids
+
+def delete_history(min_seq, max_seq, tenant_id=None):
+    # Remove history rows with min_seq <= seq <= max_seq
+    tenant_id = resolve_tenant(tenant_id)
+    for table in ("financial_checkpoints", "financial_deltas"):
+        (supabase.table(table).delete().eq(TENANT_COLUMN, tenant_id)
+         .gte("seq", int(min_seq)).lte("seq", int(max_seq)).execute())
+
+def save_history(checkpoints, deltas, tenant_id=None):
+    tenant_id = resolve_tenant(tenant_id)
+    for table, frame in (("financial_checkpoints", checkpoints), ("financial_deltas", deltas)):
+        if frame.empty:
+            continue
+        rows = frame.rename(columns={'Date': 'date'}).to_dict(orient="records")
+        for row in rows:
+            row["seq"] = int(row["seq"])
+            if "source_id" in row and pd.isna(row["source_id"]):
+                row["source_id"] = None
+            row[TENANT_COLUMN] = tenant_id
+        supabase.table(table).insert(rows).execute()
+
+def load_history(start=None, end=None, tenant_id=None):
+    # Returns (checkpoints, deltas) DataFrames covering [start, end], starting
+    # from the nearest checkpoint at or before `start`.
+    tenant_id = resolve_tenant(tenant_id)
+    base_seq = 0
+    if start is not None:
+        response = (supabase.table("financial_checkpoints").select("seq").eq(TENANT_COLUMN, tenant_id)
+                    .lte("date", str(start)).order("seq", desc=True).limit(1).execute())
+        if response.data:
+            base_seq = response.data[0]["seq"]
+    frames = []
+    for table in ("financial_checkpoints", "financial_deltas"):
+        def build_query(table=table):
+            query = supabase.table(table).select("*").eq(TENANT_COLUMN, tenant_id).gte("seq", base_seq)
+            if end is not None:
+                query = query.lte("date", str(end))
+            return query.order("seq").order("id")
+        rows = _select_all(build_query)
+        frame = pd.DataFrame(rows).rename(columns={'date': 'Date'})
+        frames.append(frame.drop(columns=[TENANT_COLUMN, 'id'], errors='ignore'))
+    if frames[1].empty:
+        frames[1] = pd.DataFrame(columns=['seq', 'Date', 'account', 'delta'])
+    return frames[0], frames[1]
 
 # --- Columns/Schema ---
 COLUMNS_FILE = 'columns.json'
@@ -5,17 +5,27 @@ import os
 from datetime import datetime, date, timedelta
 import streamlit.components.v1 as components
 import uuid
+import time
 
 # Import business logic modules
-from data_manager import load_data, save_data, ensure_guids, load_prediction_rules, save_prediction_rules
+from data_manager import (load_data, save_data, delete_data, ensure_guids, load_prediction_rules,
+                          save_prediction_rules, delete_prediction_rules)
 from prediction import generate_future_events
+from goal_seek import solve_rule_amount, solve_target_date
+from recurrence import expand_rules, describe_rule, compile_rule, invalid_rules, FREQUENCIES, DAY_TYPES, WEEKDAYS
+from compaction import BALANCE_COLUMNS, load_snapshot_history, to_snapshot_frame
+from analytics import update_rolling_metrics, month_over_month, downsample_series
 from utils.utils import generate_uuid, load_json_file
-from app_config import SUPABASE_URL, SUPABASE_KEY
+from app_config import SUPABASE_URL, SUPABASE_KEY, DEFAULT_TENANT_ID, TENANT_BY_EMAIL, REQUIRE_LOGIN, ALLOW_TENANT_QUERY_PARAM
 
 # File to persist data
 DATA_FILE = 'financial_data.json'
 PREDICTION_RULES_FILE = 'prediction_rules.json'
 
+# Analytics history is reloaded in full after this long, so changes made by
+# other sessions to older rows are picked up
+ANALYTICS_CACHE_TTL_SECONDS = 300
+
 # Default initial entry
 def get_default_entry():
     return [{
@@ -34,6 +44,56 @@ def get_default_entry():
         'OP (Euro)': 1300
     }]
 
+def resolve_session_tenant():
+    # Signed-in users (Streamlit authentication) get their own tenant, or a
+    # shared household tenant via TENANT_BY_EMAIL
+    user = getattr(st, 'user', None)
+    if user is not None and getattr(user, 'is_logged_in', False):
+        email = user.get('email')
+        if not email:
+            # Never fall back to the shared default tracker for a signed-in user
+            st.error('Your sign-in provider did not share an email address, so no tracker can be opened.')
+            st.button('Log out', on_click=st.logout)
+            st.stop()
+        return TENANT_BY_EMAIL.get(email, email)
+    if REQUIRE_LOGIN:
+        st.info('Please log in to open your tracker.')
+        st.button('Log in', on_click=st.login)
+        st.stop()
+    if ALLOW_TENANT_QUERY_PARAM:
+        st.warning('Tracker selected from the URL without sign-in: data is not isolated between trackers on this instance.')
+        return st.query_params.get('tenant', DEFAULT_TENANT_ID)
+    return DEFAULT_TENANT_ID
+
+def load_analytics_history(tenant_id):
+    # Snapshot history cached per tenant in the session; reruns only fetch
+    # snapshots dated on or after the cached last date
+    cache = st.session_state.setdefault('history_cache', {})
+    cached = cache.get(tenant_id)
+    if cached is not None and time.monotonic() - cached['loaded_at'] < ANALYTICS_CACHE_TTL_SECONDS:
+        newer = load_snapshot_history(start=cached['last_date'], tenant_id=tenant_id)
+        older = cached['history'][cached['history']['Date'] < cached['last_date']]
+        history = pd.concat([older, newer], ignore_index=True)
+        loaded_at = cached['loaded_at']
+    else:
+        history = load_snapshot_history(tenant_id=tenant_id)
+        loaded_at = time.monotonic()
+    if not history.empty:
+        cache[tenant_id] = {'history': history, 'last_date': history['Date'].max(), 'loaded_at': loaded_at}
+    return history
+
+def format_schedule(rule):
+    # Rules saved before validation may be invalid; show why so they can be fixed
+    try:
+        return describe_rule(rule)
+    except ValueError as e:
+        return f"Invalid schedule: {e}"
+
+def clear_analytics_cache():
+    # Called after this session adds, edits or deletes rows
+    st.session_state.pop('history_cache', None)
+    st.session_state.pop('analytics_cache', None)
+
 def main():
     # Set Streamlit page config for wide layout
     st.set_page_config(layout="wide")
@@ -49,17 +109,23 @@ def main():
     )
     st.markdown("<hr style='margin-top:0;margin-bottom:1.5em;border:1px solid #2E86C1;'>", unsafe_allow_html=True)
 
+    # Resolve the tenant (household/portfolio) for this session
+    tenant_id = resolve_session_tenant()
+
     # Load data
-    data = load_data()
+    data = load_data(tenant_id)
     if ensure_guids(data):
-        save_data(data)
+        save_data(data, tenant_id)
     df = pd.DataFrame(data)
     # Remove 'id' column from DataFrame if present
     if 'id' in df.columns:
         df = df.drop(columns=['id'])
     
     # Load prediction rules
-    prediction_rules = load_prediction_rules()
+    prediction_rules = load_prediction_rules(tenant_id)
+    # Rules with an invalid schedule are left out of every forecast
+    for rule_id, problem in invalid_rules(prediction_rules).items():
+        st.warning(f"Rule {rule_id} is skipped until its schedule is fixed: {problem}")
 
     # Ensure Date is always the second column for display and sort by Date descending
     if 'Date' in df.columns:
@@ -71,16 +137,33 @@ def main():
         display_df = df.copy()
 
     # --- Future Mode & Rules Mode Switch ---
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         future_mode = st.toggle('🔮 Future Mode', value=False, help='Switch to see future predictions based on recurring events')
     with col2:
         rules_mode = st.toggle('⚙️ Prediction Rules', value=False, help='View and edit prediction rules for recurring events')
+    with col3:
+        analytics_mode = st.toggle('📊 Analytics', value=False, help='Rolling averages, burn rate and volatility over the full history')
 
     # --- User selection for months ahead in future mode ---
     months_ahead = 3
+    long_horizon = False
+    growth_rates = {}
+    inflation_rate = 0.0
     if future_mode:
-        months_ahead = st.slider('How many months ahead to generate predictions?', min_value=1, max_value=12, value=3, step=1)
+        long_horizon = st.toggle('📈 Long-horizon projection', value=False, help='Project years ahead at monthly resolution with growth and inflation')
+        if long_horizon:
+            years_ahead = st.slider('How many years ahead to project?', min_value=1, max_value=30, value=5, step=1)
+            months_ahead = years_ahead * 12
+            g1, g2, g3 = st.columns(3)
+            with g1:
+                growth_rates['Grow Stock (₹)'] = st.number_input('Grow Stock annual growth (%)', value=0.0, step=0.5) / 100
+            with g2:
+                growth_rates['Grow Mutual Funds (₹)'] = st.number_input('Grow Mutual Funds annual growth (%)', value=0.0, step=0.5) / 100
+            with g3:
+                inflation_rate = st.number_input('Inflation for rule amounts (% per year)', value=0.0, step=0.5) / 100
+        else:
+            months_ahead = st.slider('How many months ahead to generate predictions?', min_value=1, max_value=12, value=3, step=1)
     
     # --- Prediction Rules Management UI ---
     if rules_mode:
@@ -110,11 +193,13 @@ def main():
             except Exception:
                 return str(x)
         rules_df['month'] = rules_df['month'].apply(format_month)
+        rules_df['schedule'] = [format_schedule(rule) for rule in prediction_rules]
         
         # Reorder and rename columns for display
-        display_cols = ['id', 'description', 'account', 'amount', 'operation', 'day', 'month']
+        display_cols = ['id', 'description', 'account', 'amount', 'operation', 'day', 'month', 'schedule']
         display_names = {'id': 'ID', 'description': 'Description', 'account': 'Account', 
-                        'amount': 'Amount', 'operation': 'Operation', 'day': 'Day', 'month': 'Month'}
+                        'amount': 'Amount', 'operation': 'Operation', 'day': 'Day', 'month': 'Month',
+                        'schedule': 'Schedule'}
         
         # Display rules table
         st.dataframe(
@@ -142,25 +227,33 @@ def main():
                 operation = rule["operation"]
                 day = rule["day"]
                 month = rule["month"] if rule["month"] is not None else ""
+                frequency = rule.get("frequency") or "monthly"
+                interval = rule.get("interval") or 1
+                day_type = rule.get("day_type") or "fixed"
+                weekday = rule.get("weekday") if rule.get("weekday") is not None else 0
+                start_date = rule.get("start_date") or ""
+                end_date = rule.get("end_date") or ""
             else:
                 st.error("Rule not found!")
                 edit_mode = False
-                rule_id = str(len(prediction_rules) + 1)
+                rule_id = generate_uuid()
                 description = ""
                 account = "SBI Overdraft (₹)"
                 amount = 0
                 operation = "add"
                 day = 1
                 month = ""
+                frequency, interval, day_type, weekday, start_date, end_date = "monthly", 1, "fixed", 0, "", ""
         else:
             edit_mode = False
-            rule_id = str(len(prediction_rules) + 1)
+            rule_id = generate_uuid()
             description = ""
             account = "SBI Overdraft (₹)"
             amount = 0
             operation = "add"
             day = 1
             month = ""
+            frequency, interval, day_type, weekday, start_date, end_date = "monthly", 1, "fixed", 0, "", ""
         
         # Rule editing form
         with st.form("rule_form"):
@@ -180,6 +273,20 @@ def main():
                 operation = st.selectbox("Operation", options=["add", "subtract"], index=0 if operation == "add" else 1)
                 day = st.number_input("Day of Month", value=int(day), min_value=1, max_value=31)
                 month_input = st.text_input("Month (leave blank for every month, or enter number 1-12)", value=month)
+
+            # Schedule options for the recurrence engine
+            col3, col4 = st.columns(2)
+            day_type_labels = {"fixed": "Day of month", "last": "Last day of month", "last_business": "Last business day of month"}
+            with col3:
+                frequency = st.selectbox("Frequency", options=FREQUENCIES,
+                                         index=FREQUENCIES.index(frequency) if frequency in FREQUENCIES else 0)
+                interval = st.number_input("Every N months (for every_n_months) or N weeks (for weekly)", value=int(interval), min_value=1, max_value=120)
+                day_type = st.selectbox("Day", options=DAY_TYPES, format_func=lambda x: day_type_labels[x],
+                                        index=DAY_TYPES.index(day_type) if day_type in DAY_TYPES else 0)
+            with col4:
+                weekday = st.selectbox("Weekday (weekly/biweekly)", options=list(range(7)), format_func=lambda x: WEEKDAYS[x], index=int(weekday))
+                start_date_input = st.text_input("Start date (YYYY-MM-DD, required for biweekly and every N months/weeks)", value=start_date)
+                end_date_input = st.text_input("End date (YYYY-MM-DD, optional)", value=end_date)
                 
             submit_rule = st.form_submit_button("Save Rule")
             
@@ -195,6 +302,13 @@ def main():
                             st.error("Month must be between 1 and 12")
                             month_value = None
                     
+                    # Validate optional date bounds (raises ValueError if malformed)
+                    start_value = start_date_input.strip() or None
+                    end_value = end_date_input.strip() or None
+                    for date_str in (start_value, end_value):
+                        if date_str:
+                            datetime.strptime(date_str, '%Y-%m-%d')
+                    
                     new_rule = {
                         "id": rule_id,
                         "day": day,
@@ -202,19 +316,19 @@ def main():
                         "description": description,
                         "account": account,
                         "amount": amount,
-                        "operation": operation
+                        "operation": operation,
+                        "frequency": frequency,
+                        "interval": interval,
+                        "day_type": day_type,
+                        "weekday": weekday,
+                        "start_date": start_value,
+                        "end_date": end_value
                     }
+                    # Reject schedules the recurrence engine cannot expand
+                    compile_rule(new_rule)
                     
                     # Update or add the rule
-                    if edit_mode:
-                        for i, rule in enumerate(prediction_rules):
-                            if rule["id"] == rule_id:
-                                prediction_rules[i] = new_rule
-                                break
-                    else:
-                        prediction_rules.append(new_rule)
-                    
-                    save_prediction_rules(prediction_rules)
+                    save_prediction_rules([new_rule], tenant_id)
                     st.success("Rule saved successfully!")
                     try:
                         st.rerun()
@@ -233,8 +347,7 @@ def main():
         
         if rule_to_delete != "None" and st.button("Delete Rule"):
             delete_id = rule_to_delete.split(":")[0].strip()
-            prediction_rules = [rule for rule in prediction_rules if rule["id"] != delete_id]
-            save_prediction_rules(prediction_rules)
+            delete_prediction_rules([delete_id], tenant_id)
             st.success("Rule deleted successfully!")
             try:
                 st.rerun()
@@ -244,6 +357,57 @@ def main():
                 except AttributeError:
                     st.warning('Please update your Streamlit version to enable auto-refresh after deleting a rule.')
     
+        # Goal seek over the monthly projection engine
+        st.markdown("### Goal Seek")
+        goal_accounts = ["Total (₹)", "SBI Overdraft (₹)", "HDFC (₹)", "ICICI (₹)", "SBI (₹)", "Grow Stock (₹)",
+                         "Grow Mutual Funds (₹)", "Need to get", "Credit card+ other exp", "OP (Euro)", "OP (₹)"]
+        goal_type = st.radio("Solve for", options=["Rule amount needed to reach a target", "Date an account reaches a target"], horizontal=True)
+        gcol1, gcol2 = st.columns(2)
+        with gcol1:
+            goal_account = st.selectbox("Target account", options=goal_accounts)
+            goal_value = st.number_input("Target value", value=0.0, step=10000.0)
+        with gcol2:
+            if goal_type == "Rule amount needed to reach a target":
+                goal_rule = st.selectbox(
+                    "Rule to solve for",
+                    options=[rule["id"] for rule in prediction_rules],
+                    format_func=lambda x: next((f"{r['id']}: {r['description']}" for r in prediction_rules if r["id"] == x), x),
+                )
+                goal_date = st.date_input("Target date", value=date.today() + timedelta(days=365 * 5), key="goal_date",
+                                          help="Balances are projected at month ends; the last month-end on or before this date is checked.")
+            else:
+                goal_years = st.slider("Search up to (years)", min_value=1, max_value=30, value=10, step=1)
+        # Assumptions for this solve only (independent of the Future Mode inputs)
+        gcol3, gcol4, gcol5 = st.columns(3)
+        with gcol3:
+            goal_stock_growth = st.number_input('Grow Stock annual growth (%)', value=0.0, step=0.5, key='goal_stock_growth') / 100
+        with gcol4:
+            goal_mf_growth = st.number_input('Grow Mutual Funds annual growth (%)', value=0.0, step=0.5, key='goal_mf_growth') / 100
+        with gcol5:
+            goal_inflation = st.number_input('Inflation for rule amounts (% per year)', value=0.0, step=0.5, key='goal_inflation') / 100
+        goal_growth_rates = {'Grow Stock (₹)': goal_stock_growth, 'Grow Mutual Funds (₹)': goal_mf_growth}
+        if not df.empty and st.button("Solve"):
+            try:
+                if goal_type == "Rule amount needed to reach a target":
+                    if goal_rule is None:
+                        st.warning("Add a prediction rule to solve for first.")
+                    else:
+                        amount_needed = solve_rule_amount(df, prediction_rules, goal_rule, goal_account, goal_value, goal_date,
+                                                          growth_rates=goal_growth_rates, inflation_rate=goal_inflation)
+                        if amount_needed is None:
+                            st.warning("The target cannot be reached by changing this rule's amount.")
+                        else:
+                            st.success(f"Set the rule amount to {amount_needed:,.0f} to reach {goal_value:,.0f} in {goal_account} by {goal_date}.")
+                else:
+                    reached_on = solve_target_date(df, prediction_rules, goal_account, goal_value, max_months=goal_years * 12,
+                                                   growth_rates=goal_growth_rates, inflation_rate=goal_inflation)
+                    if reached_on is None:
+                        st.warning(f"{goal_account} does not reach {goal_value:,.0f} within {goal_years} years at the current rules.")
+                    else:
+                        st.success(f"{goal_account} reaches {goal_value:,.0f} by {reached_on}.")
+            except Exception as e:
+                st.error(f"Error solving goal: {e}")
+
     # --- Prediction Logic Summary ---
     if future_mode:
         # Generate prediction summary dynamically from rules
@@ -257,23 +421,8 @@ def main():
             # Skip rules with amount 0
             if float(rule.get("amount", 0)) == 0:
                 continue
-            # Format day/month
-            month_val = rule.get("month", None)
-            # Handle None, NaN, and string 'nan' as 'Any'
-            is_any_month = (
-                month_val is None or
-                (isinstance(month_val, float) and pd.isna(month_val)) or
-                (isinstance(month_val, str) and month_val.strip().lower() in ["", "nan", "none"])
-            )
-            if is_any_month:
-                day_prefix = f"Every {int(rule['day'])} of the month"
-            else:
-                try:
-                    month_int = int(float(month_val))
-                    month_name = datetime(2000, month_int, 1).strftime('%B')
-                    day_prefix = f"On {month_name} {int(rule['day'])}"
-                except Exception:
-                    day_prefix = f"On month {month_val} {int(rule['day'])}"
+            # Format schedule
+            day_prefix = format_schedule(rule)
             # Format action and currency
             amount_val = rule['amount']
             account = rule['account']
@@ -294,13 +443,77 @@ def main():
         
         st.markdown(prediction_html, unsafe_allow_html=True)
 
+    # --- Analytics ---
+    if analytics_mode:
+        st.markdown(
+            """
+            <h2 style='text-align:center; color:#2E86C1; font-family: "Segoe UI", Arial, sans-serif; margin-bottom: 0.5em;'>
+                Analytics
+            </h2>
+            """,
+            unsafe_allow_html=True
+        )
+        try:
+            history = load_analytics_history(tenant_id)
+        except Exception as e:
+            st.warning(f"Compacted history unavailable ({e}); showing recent entries only.")
+            history = to_snapshot_frame(data)
+        a1, a2 = st.columns(2)
+        with a1:
+            analytics_account = st.selectbox('Account', options=BALANCE_COLUMNS, index=BALANCE_COLUMNS.index('Total (₹)'))
+        with a2:
+            window_days = st.slider('Rolling window (days)', min_value=7, max_value=365, value=30, step=1)
+        if history.empty:
+            st.info('No history to analyse yet.')
+        else:
+            # Metrics are cached per tenant/window and only extended with rows added
+            # since the last run. The watermark (number of rows and sum of totals up
+            # to the last date) catches back-dated adds, deletes and edits.
+            cache = st.session_state.setdefault('analytics_cache', {})
+            cached = cache.get((tenant_id, window_days))
+            history_dates = pd.to_datetime(history['Date'])
+
+            def watermark(last_date):
+                upto = history_dates <= last_date
+                return int(upto.sum()), float(history.loc[upto, 'Total (₹)'].sum())
+
+            metrics = None
+            if cached is not None and watermark(cached['last_date']) == cached['watermark']:
+                metrics = cached['metrics']
+            metrics = update_rolling_metrics(metrics, history, window_days)
+            last_date = metrics.index.max()
+            cache[(tenant_id, window_days)] = {
+                'metrics': metrics,
+                'last_date': last_date,
+                'watermark': watermark(last_date),
+            }
+
+            latest = metrics.iloc[-1]
+            m1, m2, m3 = st.columns(3)
+            m1.metric(f'{window_days}-day average', f"{latest[('moving_average', analytics_account)]:,.0f}")
+            m2.metric('Burn rate (per day)', f"{latest[('burn_rate', analytics_account)]:,.0f}")
+            m3.metric('Volatility', f"{latest[('volatility', analytics_account)]:,.0f}")
+
+            # Downsample to a fixed point budget so the chart payload does not grow with history
+            values = history.assign(Date=pd.to_datetime(history['Date'])).drop_duplicates('Date', keep='last').set_index('Date')[analytics_account]
+            sampled = downsample_series(values)
+            chart_df = pd.DataFrame({
+                analytics_account: sampled,
+                f'{window_days}-day average': metrics[('moving_average', analytics_account)].reindex(sampled.index),
+            })
+            st.line_chart(chart_df)
+
+            st.markdown('#### Month-over-Month Net Worth')
+            mom_df = month_over_month(history).reset_index()
+            mom_df['Date'] = mom_df['Date'].dt.strftime('%Y-%m')
+            st.dataframe(mom_df.iloc[::-1], use_container_width=True, hide_index=True)
+
     # --- Table Display Logic ---
     if future_mode:
         # Show current event if today is an event day
         last_date = pd.to_datetime(df['Date'].max())
         last_row = df[df['Date'] == df['Date'].max()].iloc[0].copy()
         today = date.today()
-        current_event = None
         
         # Create a dictionary to track account values
         account_values = {}
@@ -311,156 +524,171 @@ def main():
                 except (ValueError, TypeError):
                     account_values[col] = 0.0
         
-        # Check if any rules apply to today
-        for rule in prediction_rules:
-            rule_day = rule.get('day')
-            rule_month = rule.get('month')
+        # Apply every rule scheduled for today, in rule order
+        current_events = []
+        _, today_rule_indices = expand_rules(prediction_rules, today, today)
+        for rule_index in today_rule_indices:
+            rule = prediction_rules[rule_index]
             rule_account = rule.get('account')
             rule_amount = float(rule.get('amount', 0))
             rule_operation = rule.get('operation', 'add')
             rule_description = rule.get('description', '')
+
+            # Create a new event
+            current_event = {
+                'Date': today.strftime('%Y-%m-%d'),
+                'Event': rule_description
+            }
+
+            # Apply operation to account
+            if rule_operation == 'add':
+                account_values[rule_account] = account_values.get(rule_account, 0) + rule_amount
+            else:  # subtract
+                account_values[rule_account] = account_values.get(rule_account, 0) - rule_amount
+
+            # Add all account values to the event
+            for account, value in account_values.items():
+                current_event[account] = value
+
+            # Add derived values
+            if 'OP (Euro)' in account_values:
+                current_event['OP (₹)'] = account_values['OP (Euro)'] * 95
+            current_events.append(current_event)
+
+        if current_events:
+            st.markdown('<h4 style="color:#8E44AD;">Current Events</h4>', unsafe_allow_html=True)
+            st.table(pd.DataFrame(current_events))
+        if long_horizon:
+            projection_df = generate_future_events(
+                df, months_ahead=months_ahead, rules=prediction_rules, tenant_id=tenant_id,
+                resolution='monthly', growth_rates=growth_rates, inflation_rate=inflation_rate
+            )
+            if not projection_df.empty:
+                st.markdown(f'<h3 style="text-align:center; color:#8E44AD;">Monthly Projection (Next {months_ahead // 12} Year{"s" if months_ahead > 12 else ""})</h3>', unsafe_allow_html=True)
+                st.line_chart(projection_df.set_index('Date')[['Total (₹)']])
+                st.dataframe(projection_df, use_container_width=True, height=400, hide_index=True)
+            else:
+                st.info('No future events to display.')
+        else:
+            # Show only event rows in future, plus one day before and after each event
+            future_events_df = generate_future_events(df, months_ahead=months_ahead, rules=prediction_rules, tenant_id=tenant_id)
+            if not future_events_df.empty:
+                # Get all event dates
+                event_dates = pd.to_datetime(future_events_df['Date'])
+                # Build set of days to show: event day, day before, day after
+                days_to_show = set()
+                for d in event_dates:
+                    days_to_show.add(d)
+                    days_to_show.add(d - pd.Timedelta(days=1))
+                # Build a DataFrame for all days in the range
+                min_day = min(days_to_show)
+                max_day = max(days_to_show)
+                all_days = pd.date_range(min_day, max_day)
             
-            # Check if rule applies to today
-            if rule_day == today.day and (rule_month is None or rule_month == today.month):
-                # Create a new event
-                current_event = {
-                    'Date': today.strftime('%Y-%m-%d'),
-                    'Event': rule_description
-                }
-                
-                # Apply operation to account
-                if rule_operation == 'add':
-                    account_values[rule_account] = account_values.get(rule_account, 0) + rule_amount
-                else:  # subtract
-                    account_values[rule_account] = account_values.get(rule_account, 0) - rule_amount
-                
-                # Add all account values to the event
-                for account, value in account_values.items():
-                    current_event[account] = value
-                
-                # Add derived values
-                if 'OP (Euro)' in account_values:
-                    current_event['OP (₹)'] = account_values['OP (Euro)'] * 95
-                    
-                break  # Only show first event if multiple occur on the same day
-                
-        if current_event:
-            st.markdown('<h4 style="color:#8E44AD;">Current Event</h4>', unsafe_allow_html=True)
-            st.table(pd.DataFrame([current_event]))
-        # Show only event rows in future, plus one day before and after each event
-        future_events_df = generate_future_events(df, months_ahead=months_ahead, rules=prediction_rules)
-        if not future_events_df.empty:
-            # Get all event dates
-            event_dates = pd.to_datetime(future_events_df['Date'])
-            # Build set of days to show: event day, day before, day after
-            days_to_show = set()
-            for d in event_dates:
-                days_to_show.add(d)
-                days_to_show.add(d - pd.Timedelta(days=1))
-            # Build a DataFrame for all days in the range
-            min_day = min(days_to_show)
-            max_day = max(days_to_show)
-            all_days = pd.date_range(min_day, max_day)
-            
-            # Define all_columns before using it
-            all_columns = list(df.columns) + ['Event']
+                # Define all_columns before using it
+                all_columns = list(df.columns) + ['Event']
             
-            # For each day, if it's an event, use event row; else, fill with previous values
-            rows = []
-            prev_row = {}
-            # Initialize prev_row with all scalar values from last_row
-            for col in all_columns:
-                if col in last_row:
-                    # Convert any complex values to simple types
-                    if isinstance(last_row[col], (list, dict)):
-                        prev_row[col] = str(last_row[col])
-                    else:
-                        # Ensure numbers are float or int
-                        if '₹' in col or 'Euro' in col or col == 'Total (₹)':
-                            try:
-                                prev_row[col] = float(last_row[col])
-                            except (ValueError, TypeError):
-                                prev_row[col] = 0.0
+                # For each day, if it's an event, use event row; else, fill with previous values
+                rows = []
+                prev_row = {}
+                # Initialize prev_row with all scalar values from last_row
+                for col in all_columns:
+                    if col in last_row:
+                        # Convert any complex values to simple types
+                        if isinstance(last_row[col], (list, dict)):
+                            prev_row[col] = str(last_row[col])
                         else:
-                            prev_row[col] = last_row[col]
-            prev_row['Date'] = last_date.strftime('%Y-%m-%d')
-            prev_row['Event'] = ''
+                            # Ensure numbers are float or int
+                            if '₹' in col or 'Euro' in col or col == 'Total (₹)':
+                                try:
+                                    prev_row[col] = float(last_row[col])
+                                except (ValueError, TypeError):
+                                    prev_row[col] = 0.0
+                            else:
+                                prev_row[col] = last_row[col]
+                prev_row['Date'] = last_date.strftime('%Y-%m-%d')
+                prev_row['Event'] = ''
             
-            for day in all_days:
-                str_day = day.strftime('%Y-%m-%d')
-                if str_day in future_events_df['Date'].values:
-                    event_row = future_events_df[future_events_df['Date'] == str_day].iloc[0].to_dict()
-                    # Create a new row with all scalar values
-                    full_row = {}
-                    # First copy previous values
+                for day in all_days:
+                    str_day = day.strftime('%Y-%m-%d')
+                    if str_day in future_events_df['Date'].values:
+                        # Balances after the day's last event, labelled with every event of the day
+                        day_events = future_events_df[future_events_df['Date'] == str_day]
+                        event_row = day_events.iloc[-1].to_dict()
+                        event_row['Event'] = '; '.join(str(event) for event in day_events['Event'] if event)
+                        if 'Rule ID' in day_events.columns:
+                            event_row['Rule ID'] = ', '.join(str(rule_id) for rule_id in day_events['Rule ID'])
+                        # Create a new row with all scalar values
+                        full_row = {}
+                        # First copy previous values
+                        for col in all_columns:
+                            if col in prev_row:
+                                full_row[col] = prev_row[col]
+                            else:
+                                full_row[col] = 0 if '₹' in col or 'Euro' in col or col == 'Total (₹)' else ''
+                        # Then update with event values
+                        for col, val in event_row.items():
+                            if isinstance(val, (list, dict)):
+                                full_row[col] = str(val)
+                            else:
+                                full_row[col] = val
+                        # Always recalculate OP (₹) as OP (Euro) × 95 in the prediction table
+                        full_row['OP (₹)'] = float(full_row.get('OP (Euro)', 0)) * 95
+                        prev_row = full_row.copy()
+                    else:
+                        # Non-event: carry forward previous values, update date and clear event
+                        full_row = prev_row.copy()
+                        full_row['Date'] = str_day
+                        full_row['Event'] = ''
+                        # Always recalculate OP (₹) as OP (Euro) × 95 in the prediction table
+                        full_row['OP (₹)'] = float(full_row.get('OP (Euro)', 0)) * 95
+                    # Recalculate Total (₹)
+                    try:
+                        full_row['Total (₹)'] = sum(float(full_row.get(col, 0)) for col in [
+                            'HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 
+                            'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'OP (₹)'
+                        ]) - float(full_row.get('Credit card+ other exp', 0))
+                    except (ValueError, TypeError):
+                        full_row['Total (₹)'] = 0.0
+                    rows.append(full_row)
+                
+                # Final validation of data before creating DataFrame
+                clean_rows = []
+                for row in rows:
+                    clean_row = {}
                     for col in all_columns:
-                        if col in prev_row:
-                            full_row[col] = prev_row[col]
-                        else:
-                            full_row[col] = 0 if '₹' in col or 'Euro' in col or col == 'Total (₹)' else ''
-                    # Then update with event values
-                    for col, val in event_row.items():
-                        if isinstance(val, (list, dict)):
-                            full_row[col] = str(val)
+                        if col not in row:
+                            clean_row[col] = 0 if '₹' in col or 'Euro' in col or col == 'Total (₹)' else ''
+                        elif isinstance(row[col], (list, dict, pd.Series)):
+                            clean_row[col] = str(row[col])
                         else:
-                            full_row[col] = val
-                    # Always recalculate OP (₹) as OP (Euro) × 95 in the prediction table
-                    full_row['OP (₹)'] = float(full_row.get('OP (Euro)', 0)) * 95
-                    prev_row = full_row.copy()
-                else:
-                    # Non-event: carry forward previous values, update date and clear event
-                    full_row = prev_row.copy()
-                    full_row['Date'] = str_day
-                    full_row['Event'] = ''
-                    # Always recalculate OP (₹) as OP (Euro) × 95 in the prediction table
-                    full_row['OP (₹)'] = float(full_row.get('OP (Euro)', 0)) * 95
-                # Recalculate Total (₹)
-                try:
-                    full_row['Total (₹)'] = sum(float(full_row.get(col, 0)) for col in [
-                        'HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 
-                        'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'OP (₹)'
-                    ]) - float(full_row.get('Credit card+ other exp', 0))
-                except (ValueError, TypeError):
-                    full_row['Total (₹)'] = 0.0
-                rows.append(full_row)
-                
-            # Final validation of data before creating DataFrame
-            clean_rows = []
-            for row in rows:
-                clean_row = {}
-                for col in all_columns:
-                    if col not in row:
-                        clean_row[col] = 0 if '₹' in col or 'Euro' in col or col == 'Total (₹)' else ''
-                    elif isinstance(row[col], (list, dict, pd.Series)):
-                        clean_row[col] = str(row[col])
-                    else:
-                        clean_row[col] = row[col]
-                clean_rows.append(clean_row)
+                            clean_row[col] = row[col]
+                    clean_rows.append(clean_row)
             
-            # Now create the DataFrame with clean data
-            filtered_df = pd.DataFrame(clean_rows)
-            filtered_df = filtered_df[filtered_df['Date'].isin([d.strftime('%Y-%m-%d') for d in sorted(days_to_show)])]
-            # Reorder columns to match main table
-            display_cols = [col for col in df.columns if col != 'GUID'] + ['Event']
-            display_cols = [col for col in display_cols if col in filtered_df.columns]
-            filtered_df = filtered_df[display_cols]
-            st.markdown(f'<h3 style="text-align:center; color:#8E44AD;">Upcoming Financial Events (Next {months_ahead} Month{"s" if months_ahead > 1 else ""})</h3>', unsafe_allow_html=True)
-            # --- Export to Excel button ---
-            import io
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                filtered_df.to_excel(writer, index=False, sheet_name='Predictions')
-            excel_data = output.getvalue()
-            st.download_button(
-                label="Export to Excel",
-                data=excel_data,
-                file_name=f"future_predictions_{months_ahead}_months.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                help="Download the future prediction table as an Excel file."
-            )
-            st.dataframe(filtered_df, use_container_width=True, height=400, hide_index=True)
-        else:
-            st.info('No future events to display.')
+                # Now create the DataFrame with clean data
+                filtered_df = pd.DataFrame(clean_rows)
+                filtered_df = filtered_df[filtered_df['Date'].isin([d.strftime('%Y-%m-%d') for d in sorted(days_to_show)])]
+                # Reorder columns to match main table
+                display_cols = [col for col in df.columns if col != 'GUID'] + ['Event']
+                display_cols = [col for col in display_cols if col in filtered_df.columns]
+                filtered_df = filtered_df[display_cols]
+                st.markdown(f'<h3 style="text-align:center; color:#8E44AD;">Upcoming Financial Events (Next {months_ahead} Month{"s" if months_ahead > 1 else ""})</h3>', unsafe_allow_html=True)
+                # --- Export to Excel button ---
+                import io
+                output = io.BytesIO()
+                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+                    filtered_df.to_excel(writer, index=False, sheet_name='Predictions')
+                excel_data = output.getvalue()
+                st.download_button(
+                    label="Export to Excel",
+                    data=excel_data,
+                    file_name=f"future_predictions_{months_ahead}_months.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    help="Download the future prediction table as an Excel file."
+                )
+                st.dataframe(filtered_df, use_container_width=True, height=400, hide_index=True)
+            else:
+                st.info('No future events to display.')
     else:
         # Divide screen into two columns: left (table), right (add entry)
         left, right = st.columns([2, 1])
@@ -516,9 +744,8 @@ def main():
                 if selected_indices:
                     st.markdown(f"<p style='color:#C0392B; text-align:center; font-weight:bold;'>Selected: {len(selected_indices)} row(s)</p>", unsafe_allow_html=True)
                 if selected_indices and st.button('❌ Delete Selected Rows', key='delete_selected_btn', help='Delete selected rows'):
-                    for idx in sorted(selected_indices, reverse=True):
-                        data.pop(idx)
-                    save_data(data)
+                    delete_data([data[idx]['id'] for idx in selected_indices], tenant_id)
+                    clear_analytics_cache()
                     st.session_state['show_delete'] = False
                     try:
                         st.rerun()
@@ -585,8 +812,9 @@ def main():
                             'OP (₹)': op_inr,
                             'Total (₹)': total
                         }
-                        data[update_idx] = updated_entry
-                        save_data(data)
+                        updated_entry['id'] = data[update_idx]['id']
+                        save_data([updated_entry], tenant_id)
+                        clear_analytics_cache()
                         try:
                             st.rerun()
                         except AttributeError:
@@ -639,8 +867,8 @@ def main():
                     'OP (₹)': op_inr,
                     'Total (₹)': total
                 }
-                data.append(entry)
-                save_data(data)
+                save_data([entry], tenant_id)
+                clear_analytics_cache()
                 try:
                     st.rerun()
                 except AttributeError:
@@ -0,0 +1,100 @@
+# Goal-seek solver over the monthly projection engine
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from prediction import (build_projection_inputs, project_balances, TOTAL_COLUMNS,
+                        EXPENSE_COLUMN, EURO_TO_INR)
+from recurrence import invalid_rules
+
+# Candidate amounts evaluated in the first batched pass: 0 plus a log-spaced
+# grid from ₹1 to ₹1e9. Bisection then refines inside the bracketing pair.
+CANDIDATE_AMOUNTS = np.concatenate([[0.0], np.logspace(0, 9, 64)])
+BISECTION_TOLERANCE = 1.0
+MAX_BISECTION_STEPS = 60
+
+def _months_until(df, target_date):
+    # Projected months up to the last month-end on or before `target_date`, so
+    # rule firings after the target date in its month are not counted
+    last_period = pd.to_datetime(df['Date'].max()).to_period('M')
+    target_date = pd.Timestamp(target_date)
+    target_period = target_date.to_period('M')
+    if not target_date.is_month_end:
+        target_period -= 1
+    return (target_period - last_period).n + 1
+
+def _account_series(values, accounts, account):
+    # values[..., month, account] -> values[..., month] for `account`,
+    # deriving OP (₹) and Total (₹) the same way as projection_frame
+    index = {name: i for i, name in enumerate(accounts)}
+    op_inr = values[..., index['OP (Euro)']] * EURO_TO_INR
+    if account == 'OP (₹)':
+        return op_inr
+    if account == 'Total (₹)':
+        total = sum(values[..., index[col]] for col in TOTAL_COLUMNS if col != 'OP (₹)')
+        return total + op_inr - values[..., index[EXPENSE_COLUMN]]
+    return values[..., index[account]]
+
+def solve_rule_amount(df, rules, rule_id, account, target_value, target_date,
+                      growth_rates=None, inflation_rate=0.0):
+    # Smallest amount for rule `rule_id` such that `account` reaches
+    # `target_value` at the last month-end on or before `target_date`.
+    # Returns None if no amount between 0 and the largest candidate gets there.
+    months_ahead = _months_until(df, target_date)
+    if months_ahead < 1:
+        raise ValueError("Target date must be on or after the end of the last recorded snapshot's month")
+    unit_rules = [dict(rule, amount=1.0) if rule.get('id') == rule_id else rule for rule in rules]
+    rule_position = next((i for i, rule in enumerate(rules) if rule.get('id') == rule_id), None)
+    if rule_position is None:
+        raise ValueError(f"Rule {rule_id} not found")
+    problem = invalid_rules([rules[rule_position]]).get(rule_id)
+    if problem:
+        raise ValueError(f"Rule {rule_id} has an invalid schedule: {problem}")
+    months, accounts, balances, monthly_growth, contributions = build_projection_inputs(
+        df, months_ahead, unit_rules, growth_rates, inflation_rate
+    )
+    unit = contributions[rule_position]
+    base = contributions.sum(axis=0) - unit
+
+    def evaluate(amounts):
+        batch = base + np.asarray(amounts)[:, None, None] * unit
+        values = project_balances(balances, monthly_growth, batch)
+        return _account_series(values[:, -1, :], accounts, account)
+
+    # Reaching the target may mean growing up to it or paying down to it
+    start_value = evaluate([0.0])[0]
+    direction = 1.0 if target_value >= start_value else -1.0
+    reached = direction * (evaluate(CANDIDATE_AMOUNTS) - target_value) >= 0
+    if not reached.any():
+        return None
+    first = int(np.argmax(reached))
+    if first == 0:
+        return 0.0
+    low, high = CANDIDATE_AMOUNTS[first - 1], CANDIDATE_AMOUNTS[first]
+    for _ in range(MAX_BISECTION_STEPS):
+        if high - low <= BISECTION_TOLERANCE:
+            break
+        mid = (low + high) / 2
+        if direction * (evaluate([mid])[0] - target_value) >= 0:
+            high = mid
+        else:
+            low = mid
+    return float(high)
+
+def solve_target_date(df, rules, account, target_value, max_months=360,
+                      growth_rates=None, inflation_rate=0.0):
+    # First month-end at which `account` crosses `target_value` under the
+    # current rules (e.g. SBI Overdraft (₹) reaching 0). Returns None if it
+    # does not happen within `max_months`.
+    months, accounts, balances, monthly_growth, contributions = build_projection_inputs(
+        df, max_months, rules, growth_rates, inflation_rate
+    )
+    values = project_balances(balances, monthly_growth, contributions.sum(axis=0))
+    series = _account_series(values, accounts, account)
+    start_value = _account_series(balances, accounts, account)
+    direction = 1.0 if target_value >= start_value else -1.0
+    reached = direction * (series - target_value) >= 0
+    if not reached.any():
+        return None
+    return months[int(np.argmax(reached))].to_timestamp(how='end').strftime('%Y-%m-%d')
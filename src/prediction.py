@@ -1,5 +1,6 @@
 # Handles prediction logic and future event generation
 import pandas as pd
+import numpy as np
 from datetime import datetime, date
 import sys
 import os
@@ -9,12 +10,27 @@ SUPABASE_URL = config_module.SUPABASE_URL
 SUPABASE_KEY = config_module.SUPABASE_KEY
 from utils.utils import generate_uuid, load_json_file
 from data_manager import load_prediction_rules
+from recurrence import expand_rules
 
-def generate_future_events(df, months_ahead=3, rules=None):
+# Accounts summed into Total (₹); Credit card+ other exp is subtracted
+TOTAL_COLUMNS = [
+    'HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)',
+    'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'OP (₹)'
+]
+EXPENSE_COLUMN = 'Credit card+ other exp'
+EURO_TO_INR = 95
+# Months projected per vectorized step in monthly resolution; bounds the
+# range of the compounding factors within a step.
+PROJECTION_CHUNK_MONTHS = 120
+
+def generate_future_events(df, months_ahead=3, rules=None, tenant_id=None,
+                           resolution='daily', growth_rates=None, inflation_rate=0.0):
     if df.empty:
         return df
     if rules is None:
-        rules = load_prediction_rules()
+        rules = load_prediction_rules(tenant_id)
+    if resolution == 'monthly':
+        return generate_monthly_projection(df, months_ahead, rules, growth_rates, inflation_rate)
     last_date = pd.to_datetime(df['Date'].max())
     last_row = df[df['Date'] == df['Date'].max()].iloc[0].copy()
     account_values = {}
@@ -24,49 +40,111 @@ def generate_future_events(df, months_ahead=3, rules=None):
                 account_values[col] = float(last_row[col])
             except (ValueError, TypeError):
                 account_values[col] = 0.0
-    current_date = last_date
+    # Events fall after the last snapshot, up to the end of the last month shown
+    window_end = (last_date.to_period('M') + (months_ahead - 1)).to_timestamp(how='end')
+    event_dates, rule_indices = expand_rules(rules, last_date + pd.Timedelta(days=1), window_end)
     events = []
-    for m in range(months_ahead):
-        for d in range(1, 32):
-            try:
-                day = date(current_date.year, current_date.month, d)
-            except ValueError:
-                continue
-            if day <= last_date.date():
-                continue
-            for rule in rules:
-                rule_day = rule.get('day')
-                rule_month = rule.get('month')
-                rule_account = rule.get('account')
-                rule_amount = float(rule.get('amount', 0))
-                rule_operation = rule.get('operation', 'add')
-                rule_description = rule.get('description', '')
-                if rule_day == day.day and (rule_month is None or rule_month == day.month):
-                    event = {
-                        'Date': day.strftime('%Y-%m-%d'),
-                        'Event': rule_description
-                    }
-                    if rule_operation == 'add':
-                        account_values[rule_account] = account_values.get(rule_account, 0) + rule_amount
-                    else:
-                        account_values[rule_account] = account_values.get(rule_account, 0) - rule_amount
-                    account_values['OP (₹)'] = float(account_values.get('OP (Euro)', 0)) * 95
-                    for account, value in account_values.items():
-                        event[account] = value
-                    if rule_amount != 0:
-                        for account_col in ['HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'Credit card+ other exp', 'OP (Euro)', 'OP (₹)']:
-                            if account_col not in event or event[account_col] is None:
-                                event[account_col] = 0.0
-                        try:
-                            event['Total (₹)'] = sum(float(event.get(col, 0)) for col in [
-                                'HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 
-                                'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'OP (₹)'
-                            ]) - float(event.get('Credit card+ other exp', 0))
-                        except Exception:
-                            event['Total (₹)'] = 0.0
-                        events.append(event)
-        if current_date.month == 12:
-            current_date = date(current_date.year + 1, 1, 1)
+    for day, rule_index in zip(pd.DatetimeIndex(event_dates), rule_indices):
+        rule = rules[rule_index]
+        rule_account = rule.get('account')
+        rule_amount = float(rule.get('amount', 0))
+        rule_operation = rule.get('operation', 'add')
+        rule_description = rule.get('description', '')
+        event = {
+            'Date': day.strftime('%Y-%m-%d'),
+            'Event': rule_description,
+            'Rule ID': rule.get('id')
+        }
+        if rule_operation == 'add':
+            account_values[rule_account] = account_values.get(rule_account, 0) + rule_amount
         else:
-            current_date = date(current_date.year, current_date.month + 1, 1)
+            account_values[rule_account] = account_values.get(rule_account, 0) - rule_amount
+        account_values['OP (₹)'] = float(account_values.get('OP (Euro)', 0)) * 95
+        for account, value in account_values.items():
+            event[account] = value
+        if rule_amount != 0:
+            for account_col in ['HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'Credit card+ other exp', 'OP (Euro)', 'OP (₹)']:
+                if account_col not in event or event[account_col] is None:
+                    event[account_col] = 0.0
+            try:
+                event['Total (₹)'] = sum(float(event.get(col, 0)) for col in [
+                    'HDFC (₹)', 'ICICI (₹)', 'SBI (₹)', 'SBI Overdraft (₹)', 
+                    'Grow Stock (₹)', 'Grow Mutual Funds (₹)', 'Need to get', 'OP (₹)'
+                ]) - float(event.get('Credit card+ other exp', 0))
+            except Exception:
+                event['Total (₹)'] = 0.0
+            events.append(event)
     return pd.DataFrame(events)
+
+def build_projection_inputs(df, months_ahead, rules, growth_rates=None, inflation_rate=0.0):
+    # Shared setup for monthly projections. Returns (months, accounts,
+    # starting balances, monthly growth factors, rule contributions) where
+    # contributions[r, m, a] is what rule r adds to account a in month m.
+    last_date = pd.to_datetime(df['Date'].max())
+    last_row = df[df['Date'] == df['Date'].max()].iloc[0]
+    accounts = [col for col in TOTAL_COLUMNS + [EXPENSE_COLUMN, 'OP (Euro)'] if col != 'OP (₹)']
+    # Extra accounts named by rules, each once and in rule order
+    accounts = list(dict.fromkeys(accounts + [rule.get('account') for rule in rules if rule.get('account')]))
+    balances = pd.to_numeric(last_row.reindex(accounts), errors='coerce').fillna(0.0).to_numpy(dtype=float)
+
+    months = pd.period_range(last_date.to_period('M'), periods=months_ahead, freq='M')
+    inflation = (1.0 + inflation_rate) ** (np.arange(months_ahead) / 12.0)
+
+    # Occurrences of each rule per month, from the compiled recurrence engine
+    event_dates, rule_indices = expand_rules(
+        rules, last_date + pd.Timedelta(days=1), months[-1].to_timestamp(how='end')
+    )
+    month_indices = (event_dates.astype('datetime64[M]').astype('int64')
+                     - np.datetime64(months[0].start_time, 'M').astype('int64'))
+    occurrences = np.zeros((len(rules), months_ahead))
+    np.add.at(occurrences, (rule_indices, month_indices), 1)
+
+    account_index = {account: i for i, account in enumerate(accounts)}
+    contributions = np.zeros((len(rules), months_ahead, len(accounts)))
+    for r, rule in enumerate(rules):
+        amount = float(rule.get('amount', 0) or 0)
+        if amount == 0 or not rule.get('account'):
+            continue
+        sign = 1.0 if rule.get('operation', 'add') == 'add' else -1.0
+        contributions[r, :, account_index[rule.get('account')]] = occurrences[r] * sign * amount * inflation
+
+    monthly_growth = np.ones(len(accounts))
+    for account, rate in (growth_rates or {}).items():
+        if account in account_index:
+            monthly_growth[account_index[account]] = (1.0 + rate) ** (1.0 / 12.0)
+    return months, accounts, balances, monthly_growth, contributions
+
+def project_balances(balances, monthly_growth, contributions):
+    # Month-end balances for B[m] = g * B[m-1] + C[m], solved per chunk in
+    # closed form: B[m] = g^k * (B0 + sum_{j<=k} C[j] * g^-j) for month k
+    # within the chunk. `contributions` is (..., months, accounts); any leading
+    # dimensions are evaluated as a batch of independent scenarios.
+    months_ahead = contributions.shape[-2]
+    balances = np.broadcast_to(balances, contributions.shape[:-2] + balances.shape[-1:])
+    values = np.empty(contributions.shape)
+    for start in range(0, months_ahead, PROJECTION_CHUNK_MONTHS):
+        stop = min(start + PROJECTION_CHUNK_MONTHS, months_ahead)
+        steps = np.arange(1, stop - start + 1)[:, None]
+        growth = monthly_growth ** steps
+        chunk = contributions[..., start:stop, :]
+        values[..., start:stop, :] = growth * (balances[..., None, :] + np.cumsum(chunk / growth, axis=-2))
+        balances = values[..., stop - 1, :]
+    return values
+
+def projection_frame(months, accounts, values):
+    result = pd.DataFrame(values, columns=accounts)
+    result['OP (₹)'] = result['OP (Euro)'] * EURO_TO_INR
+    result['Total (₹)'] = result[TOTAL_COLUMNS].sum(axis=1) - result[EXPENSE_COLUMN]
+    result.insert(0, 'Date', months.to_timestamp(how='end').strftime('%Y-%m-%d'))
+    return result
+
+def generate_monthly_projection(df, months_ahead, rules, growth_rates=None, inflation_rate=0.0):
+    # Long-horizon projection: one row per month (dated at month end) instead of
+    # one row per event. `growth_rates` maps account -> annual growth/interest
+    # rate compounded monthly (e.g. {'Grow Stock (₹)': 0.12}); rule amounts are
+    # indexed by `inflation_rate` per year from the last recorded snapshot.
+    months, accounts, balances, monthly_growth, contributions = build_projection_inputs(
+        df, months_ahead, rules, growth_rates, inflation_rate
+    )
+    values = project_balances(balances, monthly_growth, contributions.sum(axis=0))
+    return projection_frame(months, accounts, values)
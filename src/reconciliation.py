@@ -0,0 +1,136 @@
+# Forecast-vs-actual reconciliation of prediction rules
+import pandas as pd
+import fcntl
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.utils import load_json_file, save_json_file
+from data_manager import load_prediction_rules, resolve_tenant
+from prediction import generate_future_events
+from compaction import BALANCE_COLUMNS, downsample_monthly, load_snapshot_history
+
+# Per-tenant state files live in RECONCILIATION_STATE_DIR (or --state-dir),
+# defaulting to reconciliation_state/ at the repository root, so runs from any
+# working directory share the same state.
+DEFAULT_STATE_DIR = os.getenv(
+    'RECONCILIATION_STATE_DIR',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'reconciliation_state')),
+)
+RECONCILIATION_STATE_FILE = 'reconciliation_state_{tenant}.json'
+
+def empty_state():
+    # Running sums per group so each run only has to add its new snapshots
+    return {'last_date': None, 'by_rule': {}, 'by_account': {}, 'by_month': {}}
+
+def _accumulate(bucket, keys, errors):
+    # Add count / sum / sum of abs / sum of squares of `errors` grouped by `keys`
+    stats = pd.DataFrame({'key': keys.astype(str).to_numpy(), 'error': errors.to_numpy(dtype=float)})
+    stats['abs'] = stats['error'].abs()
+    stats['sq'] = stats['error'] ** 2
+    grouped = stats.groupby('key').agg(count=('error', 'size'), sum=('error', 'sum'),
+                                       sum_abs=('abs', 'sum'), sum_sq=('sq', 'sum'))
+    for key, row in grouped.iterrows():
+        current = bucket.setdefault(key, {'count': 0, 'sum': 0.0, 'sum_abs': 0.0, 'sum_sq': 0.0})
+        for field in current:
+            current[field] += float(row[field])
+
+def replay_forecasts(origins, rules, months_ahead):
+    # Predicted events from each origin snapshot, tagged with the origin date
+    frames = []
+    for _, origin in origins.iterrows():
+        events = generate_future_events(origin.to_frame().T, months_ahead=months_ahead, rules=rules)
+        if not events.empty:
+            frames.append(events.assign(Origin=origin['Date']))
+    if not frames:
+        return pd.DataFrame(columns=['Date', 'Origin', 'Rule ID'] + BALANCE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+def match_predictions(snapshots, events, tolerance_days):
+    # Sort-merge join: each actual snapshot is paired, per origin, with the
+    # predicted end-of-day state of the latest event day at most
+    # `tolerance_days` before it. 'Rule IDs' lists every rule firing that day.
+    left = snapshots.merge(events[['Origin']].drop_duplicates(), how='cross')
+    left = left[left['Origin'] < left['Date']]
+    left['Date'] = pd.to_datetime(left['Date'])
+    right = events.copy()
+    right['Date'] = pd.to_datetime(right['Date'])
+    right['Predicted Date'] = right['Date']
+    # Stable sort keeps same-day events in rule order, so the last one per day
+    # carries the end-of-day balances
+    right = right.sort_values(['Origin', 'Date'], kind='stable')
+    day_rules = right.groupby(['Origin', 'Date'], sort=False)['Rule ID'].agg(list).rename('Rule IDs')
+    right = right.drop_duplicates(['Origin', 'Date'], keep='last').drop(columns=['Rule ID'])
+    right = right.join(day_rules, on=['Origin', 'Date'])
+    matched = pd.merge_asof(
+        left.sort_values('Date', kind='stable'), right.sort_values('Date', kind='stable'),
+        on='Date', by='Origin', direction='backward', tolerance=pd.Timedelta(days=tolerance_days),
+        suffixes=('_actual', '_predicted'),
+    )
+    return matched.dropna(subset=['Predicted Date']).reset_index(drop=True)
+
+def reconcile(snapshots, rules, state=None, months_ahead=3, tolerance_days=3):
+    # Replays forecasts from past month-end snapshots and folds the errors of
+    # snapshots recorded after state['last_date'] into the running statistics.
+    state = state or empty_state()
+    snapshots = snapshots.sort_values('Date', kind='stable').reset_index(drop=True)
+    new = snapshots if state['last_date'] is None else snapshots[snapshots['Date'] > state['last_date']]
+    if new.empty:
+        return state
+    # Only origins whose forecast horizon can reach one of the new snapshots
+    earliest_origin = (pd.to_datetime(new['Date'].min()) - pd.DateOffset(months=months_ahead)).strftime('%Y-%m-%d')
+    origins = downsample_monthly(snapshots)
+    origins = origins[(origins['Date'] >= earliest_origin) & (origins['Date'] < new['Date'].max())]
+    events = replay_forecasts(origins, rules, months_ahead)
+    if not events.empty:
+        matched = match_predictions(new, events, tolerance_days)
+        errors = pd.DataFrame({
+            col: matched[f'{col}_actual'] - matched[f'{col}_predicted'].astype(float)
+            for col in BALANCE_COLUMNS
+        })
+        long_errors = errors.melt(var_name='account', value_name='error')
+        _accumulate(state['by_account'], long_errors['account'], long_errors['error'])
+        _accumulate(state['by_month'], matched['Date'].dt.strftime('%Y-%m'), errors['Total (₹)'])
+        # Per rule, error on the account that rule moves, for every rule that
+        # fired on the matched event day
+        rule_accounts = {str(rule.get('id')): rule.get('account') for rule in rules}
+        per_rule = matched['Rule IDs'].explode()
+        rule_ids = per_rule.astype(str)
+        accounts = rule_ids.map(rule_accounts)
+        known = accounts.isin(BALANCE_COLUMNS).to_numpy()
+        column_positions = accounts[known].map({col: i for i, col in enumerate(BALANCE_COLUMNS)}).to_numpy()
+        rule_errors = pd.Series(errors.to_numpy()[per_rule.index.to_numpy()[known], column_positions])
+        _accumulate(state['by_rule'], rule_ids[known], rule_errors)
+    state['last_date'] = new['Date'].max()
+    return state
+
+def reconciliation_report(state):
+    # DataFrames of count / mean error / MAE / RMSE per rule, account and month
+    report = {}
+    for name in ('by_rule', 'by_account', 'by_month'):
+        stats = pd.DataFrame.from_dict(state[name], orient='index',
+                                       columns=['count', 'sum', 'sum_abs', 'sum_sq'])
+        stats['mean_error'] = stats['sum'] / stats['count']
+        stats['mae'] = stats['sum_abs'] / stats['count']
+        stats['rmse'] = (stats['sum_sq'] / stats['count']) ** 0.5
+        report[name] = stats[['count', 'mean_error', 'mae', 'rmse']].sort_index()
+    return report
+
+def run_reconciliation(tenant_id=None, months_ahead=3, tolerance_days=3, state_dir=None):
+    tenant_id = resolve_tenant(tenant_id)
+    state_dir = state_dir or DEFAULT_STATE_DIR
+    os.makedirs(state_dir, exist_ok=True)
+    state_file = os.path.join(state_dir, RECONCILIATION_STATE_FILE.format(tenant=tenant_id))
+    # One run per tenant at a time: concurrent runs wait instead of
+    # overwriting each other's state
+    with open(state_file + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = load_json_file(state_file) or empty_state()
+        start = state['last_date']
+        if start is not None:
+            start = (pd.to_datetime(start) - pd.DateOffset(months=months_ahead + 1)).strftime('%Y-%m-%d')
+        snapshots = load_snapshot_history(start=start, tenant_id=tenant_id)
+        state = reconcile(snapshots, load_prediction_rules(tenant_id), state, months_ahead, tolerance_days)
+        # Write then rename so an interrupted run never leaves a truncated file
+        save_json_file(state_file + '.tmp', state)
+        os.replace(state_file + '.tmp', state_file)
+    return reconciliation_report(state)
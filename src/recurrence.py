@@ -0,0 +1,166 @@
+# Compiled recurrence engine: expands prediction rules into event dates
+import json
+from functools import lru_cache
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Rule schedule fields (all optional, defaults keep the original behaviour of
+# "day D of every month" / "day D of month M"):
+#   frequency:  'monthly' | 'weekly' | 'biweekly' | 'every_n_months'
+#   interval:   N for 'every_n_months' (and every N weeks for 'weekly');
+#               ignored for 'monthly'
+#   day_type:   'fixed' (use day, clamped to short months) | 'last' | 'last_business'
+#   weekday:    0 (Monday) .. 6 (Sunday) for weekly schedules
+#   start_date / end_date: 'YYYY-MM-DD' bounds; start_date also sets the phase
+#               of biweekly and every-N-months/weeks schedules, so it is
+#               required whenever the interval is above 1
+FREQUENCIES = ['monthly', 'weekly', 'biweekly', 'every_n_months']
+DAY_TYPES = ['fixed', 'last', 'last_business']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+_EMPTY_DATES = np.array([], dtype='datetime64[D]')
+
+def is_blank(value):
+    return (
+        value is None or
+        (isinstance(value, float) and pd.isna(value)) or
+        (isinstance(value, str) and value.strip().lower() in ["", "nan", "none"])
+    )
+
+def _int_or(value, default):
+    return default if is_blank(value) else int(float(value))
+
+def compile_rule(rule):
+    # Normalised, hashable schedule for one rule
+    frequency = rule.get('frequency')
+    frequency = 'monthly' if is_blank(frequency) else frequency
+    interval = max(_int_or(rule.get('interval'), 1), 1)
+    if frequency == 'biweekly':
+        frequency, interval = 'weekly', 2
+    elif frequency == 'every_n_months':
+        frequency = 'monthly'
+    elif frequency == 'monthly':
+        interval = 1
+    elif frequency not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency '{frequency}'")
+    day_type = rule.get('day_type')
+    day_type = 'fixed' if is_blank(day_type) else day_type
+    if day_type not in DAY_TYPES:
+        raise ValueError(f"Unknown day_type '{day_type}'")
+    start_date = None if is_blank(rule.get('start_date')) else str(rule.get('start_date'))[:10]
+    end_date = None if is_blank(rule.get('end_date')) else str(rule.get('end_date'))[:10]
+    if interval > 1 and start_date is None:
+        raise ValueError("A start_date is required for schedules repeating every N months or weeks")
+    return (
+        frequency, interval, _int_or(rule.get('day'), 1), day_type,
+        _int_or(rule.get('month'), None), _int_or(rule.get('weekday'), None), start_date, end_date,
+    )
+
+def _compile_or_none(rule):
+    try:
+        return compile_rule(rule)
+    except (ValueError, TypeError):
+        return None
+
+@lru_cache(maxsize=32)
+def _compile_cached(rules_key):
+    return tuple(_compile_or_none(rule) for rule in json.loads(rules_key))
+
+def compile_rules(rules):
+    # Compiled once per distinct rule set; invalid rules compile to None
+    return _compile_cached(json.dumps(rules, sort_keys=True, default=str))
+
+def invalid_rules(rules):
+    # {rule id: reason} for rules whose schedule cannot be expanded. They are
+    # skipped by expand_rules, so callers should surface this to the user.
+    problems = {}
+    for rule in rules:
+        try:
+            compile_rule(rule)
+        except (ValueError, TypeError) as e:
+            problems[rule.get('id')] = str(e)
+    return problems
+
+def _weekday(dates):
+    # 1970-01-01 was a Thursday; Monday == 0
+    return (dates.astype('int64') + 3) % 7
+
+def _expand_rule(spec, start, end):
+    frequency, interval, day, day_type, month, weekday, start_date, end_date = spec
+    low = max(start, np.datetime64(start_date, 'D')) if start_date else start
+    high = min(end, np.datetime64(end_date, 'D')) if end_date else end
+    if low > high:
+        return _EMPTY_DATES
+    if frequency == 'weekly':
+        anchor = np.datetime64(start_date, 'D') if start_date else np.datetime64('1970-01-05', 'D')
+        if weekday is None:
+            weekday = int(_weekday(anchor))
+        first = anchor + (weekday - int(_weekday(anchor))) % 7
+        step = 7 * interval
+        skip = max(-(-(low - first).astype('int64') // step), 0)
+        return np.arange(first + skip * step, high + 1, step)
+    months = np.arange(low.astype('datetime64[M]'), high.astype('datetime64[M]') + 1)
+    month_numbers = months.astype('int64')
+    if month is not None:
+        months = months[month_numbers % 12 + 1 == month]
+        month_numbers = months.astype('int64')
+    if interval > 1:
+        anchor = np.datetime64(start_date, 'D').astype('datetime64[M]').astype('int64')
+        months = months[(month_numbers - anchor) % interval == 0]
+    last_days = (months + 1).astype('datetime64[D]') - 1
+    if day_type == 'last':
+        dates = last_days
+    elif day_type == 'last_business':
+        dates = np.busday_offset(last_days, 0, roll='backward')
+    else:
+        # Days past the end of a short month fall on its last day
+        dates = np.minimum(months.astype('datetime64[D]') + (day - 1), last_days)
+    return dates[(dates >= low) & (dates <= high)]
+
+@lru_cache(maxsize=64)
+def _expand_cached(compiled, start, end):
+    start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    expanded = [_EMPTY_DATES if spec is None else _expand_rule(spec, start, end) for spec in compiled]
+    dates = np.concatenate([_EMPTY_DATES] + expanded)
+    rule_indices = np.repeat(np.arange(len(compiled)), [len(d) for d in expanded])
+    order = np.lexsort((rule_indices, dates))
+    dates, rule_indices = dates[order], rule_indices[order]
+    dates.flags.writeable = False
+    rule_indices.flags.writeable = False
+    return dates, rule_indices
+
+def expand_rules(rules, start, end):
+    # All event dates in [start, end] as (dates, rule_indices) arrays sorted by
+    # date, then by rule order. Cached per rule set and horizon. Rules with an
+    # invalid schedule (see invalid_rules) have no events.
+    return _expand_cached(compile_rules(rules), str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date()))
+
+def describe_rule(rule):
+    # Human readable schedule, e.g. "Every 2 months on the last business day"
+    frequency, interval, day, day_type, month, weekday, start_date, end_date = compile_rule(rule)
+    if frequency == 'weekly':
+        weekday_name = WEEKDAYS[weekday] if weekday is not None else (
+            WEEKDAYS[datetime.strptime(start_date, '%Y-%m-%d').weekday()] if start_date else 'Monday')
+        text = f"Every {weekday_name}" if interval == 1 else f"Every {interval} weeks on {weekday_name}"
+    else:
+        if day_type == 'last':
+            on = "the last day"
+        elif day_type == 'last_business':
+            on = "the last business day"
+        else:
+            on = f"day {day}"
+        if month is not None:
+            text = f"On {datetime(2000, month, 1).strftime('%B')} {day}" if day_type == 'fixed' else \
+                f"On {on} of {datetime(2000, month, 1).strftime('%B')}"
+        elif interval > 1:
+            text = f"Every {interval} months on {on}"
+        elif day_type == 'fixed':
+            text = f"Every {day} of the month"
+        else:
+            text = f"On {on} of every month"
+    if start_date:
+        text += f" from {start_date}"
+    if end_date:
+        text += f" until {end_date}"
+    return text
@@ -0,0 +1,36 @@
+# Incremental rolling metrics must match a full recompute on unevenly spaced
+# snapshots.
+import os
+import sys
+import numpy as np
+import pandas as pd
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from analytics import compute_rolling_metrics, update_rolling_metrics
+from compaction import BALANCE_COLUMNS
+
+def uneven_snapshots(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(np.cumsum(rng.integers(1, 12, n)), 'D')
+    snapshots = pd.DataFrame({col: rng.normal(0, 1000, n).cumsum() for col in BALANCE_COLUMNS})
+    snapshots.insert(0, 'Date', dates.strftime('%Y-%m-%d'))
+    return snapshots
+
+def test_update_matches_full_recompute():
+    snapshots = uneven_snapshots()
+    for window_days in (7, 30, 90):
+        full = compute_rolling_metrics(snapshots, window_days)
+        for split in (5, 50, 120, 199):
+            cached = compute_rolling_metrics(snapshots.iloc[:split], window_days)
+            updated = update_rolling_metrics(cached, snapshots, window_days)
+            pd.testing.assert_frame_equal(updated, full, check_freq=False)
+
+def test_update_keeps_change_into_window():
+    # The change into 2024-01-20 lies inside the window of 2024-02-15 and
+    # needs the 2024-01-01 snapshot, which is outside the lookback window
+    snapshots = pd.DataFrame({col: [100.0, 50.0, 300.0, 200.0, 260.0] for col in BALANCE_COLUMNS})
+    snapshots.insert(0, 'Date', ['2024-01-01', '2024-01-20', '2024-02-10', '2024-02-15', '2024-02-25'])
+    cached = compute_rolling_metrics(snapshots.iloc[:3], 30)
+    updated = update_rolling_metrics(cached, snapshots, 30)
+    pd.testing.assert_frame_equal(updated, compute_rolling_metrics(snapshots, 30), check_freq=False)
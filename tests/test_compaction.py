@@ -0,0 +1,151 @@
+# Round trips through the checkpoint/delta history, and compact_history
+# against an in-memory stand-in for the Supabase tables.
+import os
+import sys
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+import compaction
+from compaction import (BALANCE_COLUMNS, compact_snapshots, compact_history, downsample_monthly,
+                        load_snapshot_history, reconstruct_snapshots, to_snapshot_frame)
+
+def snapshot_rows(n=100, first=date(2023, 1, 1), seed=0):
+    # Raw financial_data rows: a few balances change per snapshot, some not at all
+    rng = np.random.default_rng(seed)
+    balances = dict.fromkeys(BALANCE_COLUMNS, 1000.0)
+    rows = []
+    day = first
+    for i in range(n):
+        for col in rng.choice(BALANCE_COLUMNS, size=rng.integers(0, 3), replace=False):
+            balances[col] += float(rng.integers(-500, 500))
+        rows.append(dict(balances, id=f'row-{i:03d}', Date=day.strftime('%Y-%m-%d')))
+        day += timedelta(days=int(rng.integers(1, 5)))
+    return rows
+
+def test_round_trip():
+    df = to_snapshot_frame(snapshot_rows())
+    checkpoints, deltas = compact_snapshots(df, checkpoint_every=7)
+    assert len(checkpoints) == 15
+    assert (deltas['delta'] != 0).sum() < len(df) * len(BALANCE_COLUMNS) / 3
+    pd.testing.assert_frame_equal(reconstruct_snapshots(checkpoints, deltas), df)
+
+def test_partial_range_from_nearest_checkpoint():
+    df = to_snapshot_frame(snapshot_rows())
+    checkpoints, deltas = compact_snapshots(df, checkpoint_every=7, start_seq=50)
+    start, end = df['Date'][40], df['Date'][75]
+    # What load_history returns for [start, end]: from the nearest checkpoint at or before start
+    base_seq = checkpoints.loc[checkpoints['Date'] <= start, 'seq'].max()
+    rebuilt = reconstruct_snapshots(checkpoints[(checkpoints['seq'] >= base_seq) & (checkpoints['Date'] <= end)],
+                                    deltas[(deltas['seq'] >= base_seq) & (deltas['Date'] <= end)], start, end)
+    expected = df[(df['Date'] >= start) & (df['Date'] <= end)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(rebuilt, expected)
+
+def test_downsample_keeps_last_snapshot_per_month():
+    df = to_snapshot_frame(snapshot_rows())
+    sampled = downsample_monthly(df)
+    assert sampled['Date'].str[:7].is_unique
+    assert list(sampled['Date'].str[:7]) == list(df['Date'].str[:7].unique())
+    expected = df.groupby(df['Date'].str[:7]).tail(1).reset_index(drop=True)
+    pd.testing.assert_frame_equal(sampled, expected)
+    checkpoints, deltas = compact_snapshots(sampled, checkpoint_every=3)
+    pd.testing.assert_frame_equal(reconstruct_snapshots(checkpoints, deltas), sampled)
+
+class FakeStore:
+    # financial_data plus the two history tables, with data_manager's query semantics
+    def __init__(self, rows):
+        self.rows = [dict(row) for row in rows]
+        self.checkpoints = pd.DataFrame()
+        self.deltas = pd.DataFrame()
+
+    def load_data(self, tenant_id=None):
+        return sorted((dict(row) for row in self.rows), key=lambda row: (row['Date'], row['id']))
+
+    def delete_data(self, ids, tenant_id=None):
+        self.rows = [row for row in self.rows if row['id'] not in set(ids)]
+
+    def save_history(self, checkpoints, deltas, tenant_id=None):
+        self.checkpoints = pd.concat([self.checkpoints, checkpoints], ignore_index=True)
+        self.deltas = pd.concat([self.deltas, deltas], ignore_index=True)
+
+    def delete_history(self, min_seq, max_seq, tenant_id=None):
+        self.checkpoints = self.checkpoints[~self.checkpoints['seq'].between(min_seq, max_seq)]
+        self.deltas = self.deltas[~self.deltas['seq'].between(min_seq, max_seq)]
+
+    def get_max_history_seq(self, tenant_id=None):
+        seqs = [frame['seq'].max() for frame in (self.checkpoints, self.deltas) if not frame.empty]
+        return int(max(seqs)) if seqs else -1
+
+    def get_latest_history_date(self, tenant_id=None):
+        dates = [frame['Date'].max() for frame in (self.checkpoints, self.deltas) if not frame.empty]
+        return max(dates) if dates else None
+
+    def get_compacted_source_ids(self, tenant_id=None, since=None):
+        ids = set()
+        for frame in (self.checkpoints, self.deltas):
+            if not frame.empty:
+                ids.update(frame.loc[frame['Date'] >= str(since or ''), 'source_id'].dropna())
+        return ids
+
+    def load_history(self, start=None, end=None, tenant_id=None):
+        if self.checkpoints.empty:
+            return self.checkpoints, self.deltas
+        base_seq = 0
+        if start is not None:
+            before = self.checkpoints[self.checkpoints['Date'] <= str(start)]
+            if not before.empty:
+                base_seq = before['seq'].max()
+        frames = []
+        for frame in (self.checkpoints, self.deltas):
+            frame = frame[frame['seq'] >= base_seq]
+            if end is not None:
+                frame = frame[frame['Date'] <= str(end)]
+            frames.append(frame.sort_values('seq', kind='stable'))
+        return frames[0], frames[1]
+
+@pytest.fixture
+def store(monkeypatch):
+    today = date.today()
+    fake = FakeStore(snapshot_rows(n=60, first=today - timedelta(days=400)))
+    for name in ('load_data', 'delete_data', 'save_history', 'delete_history', 'get_max_history_seq',
+                 'get_latest_history_date', 'get_compacted_source_ids', 'load_history'):
+        monkeypatch.setattr(compaction, name, getattr(fake, name))
+    return fake
+
+def test_compact_history_round_trip(store):
+    expected = to_snapshot_frame(store.rows)
+    moved = compact_history(keep_recent_days=200, checkpoint_every=7)
+    assert moved > 0
+    assert len(store.rows) == 60 - moved
+    pd.testing.assert_frame_equal(load_snapshot_history(), expected, check_dtype=False)
+
+def test_compact_history_keeps_back_dated_rows(store):
+    compact_history(keep_recent_days=200, checkpoint_every=7)
+    latest = store.get_latest_history_date()
+    middle = store.checkpoints['Date'].iloc[1]
+    # A back-dated entry and a second snapshot on the newest compacted date
+    store.rows.append(dict(dict.fromkeys(BALANCE_COLUMNS, 7.0), id='back-dated', Date=middle))
+    store.rows.append(dict(dict.fromkeys(BALANCE_COLUMNS, 9.0), id='same-day', Date=latest))
+    before = load_snapshot_history()
+    assert compact_history(keep_recent_days=200, checkpoint_every=7) == 2
+    assert {'back-dated', 'same-day'}.isdisjoint(row['id'] for row in store.rows)
+    after = load_snapshot_history()
+    pd.testing.assert_frame_equal(after, before, check_dtype=False)
+    assert (after[BALANCE_COLUMNS] == 7.0).all(axis=1).sum() == 1
+    # Seq order still follows date order after the rewrite
+    history = pd.concat([store.checkpoints, store.deltas]).sort_values('seq', kind='stable')
+    assert history['Date'].is_monotonic_increasing
+
+def test_compact_history_is_idempotent_after_failed_trim(store, monkeypatch):
+    expected = to_snapshot_frame(store.rows)
+    monkeypatch.setattr(compaction, 'delete_data', lambda ids, tenant_id=None: None)
+    moved = compact_history(keep_recent_days=200, checkpoint_every=7)
+    history_rows = len(store.checkpoints) + len(store.deltas)
+    pd.testing.assert_frame_equal(load_snapshot_history(), expected, check_dtype=False)
+    monkeypatch.setattr(compaction, 'delete_data', store.delete_data)
+    assert compact_history(keep_recent_days=200, checkpoint_every=7) == moved
+    assert len(store.checkpoints) + len(store.deltas) == history_rows
+    pd.testing.assert_frame_equal(load_snapshot_history(), expected, check_dtype=False)
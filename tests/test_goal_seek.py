@@ -0,0 +1,44 @@
+# Goal-seek answers checked against the monthly projection they are solved on
+import os
+import sys
+import pandas as pd
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from compaction import BALANCE_COLUMNS
+from goal_seek import BISECTION_TOLERANCE, solve_rule_amount, solve_target_date
+from prediction import generate_monthly_projection
+
+SNAPSHOT = pd.DataFrame([dict({'Date': '2025-01-10'}, **dict.fromkeys(BALANCE_COLUMNS, 0.0))])
+RULES = [
+    {'id': 'salary', 'day': 5, 'account': 'HDFC (₹)', 'amount': 1000, 'operation': 'add'},
+    {'id': 'sip', 'day': 5, 'account': 'Grow Mutual Funds (₹)', 'amount': 100, 'operation': 'add'},
+]
+GROWTH = {'Grow Mutual Funds (₹)': 0.12}
+
+def balance_on(rules, account, on_date):
+    # Projected balance at the last month-end on or before `on_date`
+    months = (pd.Period(on_date, freq='M') - pd.Period(SNAPSHOT['Date'][0], freq='M')).n + 1
+    projection = generate_monthly_projection(SNAPSHOT, months, rules, GROWTH)
+    return projection.loc[projection['Date'] <= on_date, account].iloc[-1]
+
+def test_solved_amount_reaches_target_by_date():
+    for target_date in ('2030-01-01', '2030-01-31', '2029-06-17'):
+        amount = solve_rule_amount(SNAPSHOT, RULES, 'sip', 'Grow Mutual Funds (₹)', 200000, target_date, GROWTH)
+        solved = [dict(rule, amount=amount) if rule['id'] == 'sip' else rule for rule in RULES]
+        assert balance_on(solved, 'Grow Mutual Funds (₹)', target_date) >= 200000
+        # ...and is the smallest such amount, to the bisection tolerance
+        lower = [dict(rule, amount=amount - BISECTION_TOLERANCE) if rule['id'] == 'sip' else rule for rule in RULES]
+        assert balance_on(lower, 'Grow Mutual Funds (₹)', target_date) < 200000
+
+def test_target_date_ignores_firings_after_it():
+    # Day-5 firings in January 2030 are after the target date, so the answer
+    # must not depend on whether January is projected
+    early = solve_rule_amount(SNAPSHOT, RULES, 'salary', 'HDFC (₹)', 60000, '2030-01-01', GROWTH)
+    december = solve_rule_amount(SNAPSHOT, RULES, 'salary', 'HDFC (₹)', 60000, '2029-12-31', GROWTH)
+    assert early == december
+
+def test_target_date_matches_projection():
+    reached = solve_target_date(SNAPSHOT, RULES, 'HDFC (₹)', 10500, max_months=24, growth_rates=GROWTH)
+    projection = generate_monthly_projection(SNAPSHOT, 24, RULES, GROWTH)
+    assert reached == projection.loc[projection['HDFC (₹)'] >= 10500, 'Date'].iloc[0]
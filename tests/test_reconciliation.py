@@ -0,0 +1,45 @@
+# Reconciliation checks that run without a database: reconcile() is fed
+# snapshots generated by the rules themselves, so every error must be zero.
+import os
+import sys
+import pandas as pd
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from compaction import BALANCE_COLUMNS
+from prediction import generate_future_events
+from reconciliation import reconcile, reconciliation_report
+
+# Several rules moving the same account on the same day
+RULES = [
+    {'id': f'r{i}', 'day': 1, 'account': 'HDFC (₹)', 'amount': amount, 'operation': operation,
+     'description': f'rule {i}'}
+    for i, (amount, operation) in enumerate([(50000, 'add'), (12000, 'subtract'), (3000, 'subtract'),
+                                             (800, 'subtract'), (20000, 'add')])
+]
+
+def perfect_snapshots(months=6):
+    # Day-1 snapshots taken after every rule has fired, plus a mid-month one
+    start = pd.DataFrame([dict({'Date': '2024-01-01'}, **{col: 1000.0 for col in BALANCE_COLUMNS})])
+    events = generate_future_events(start, months_ahead=months, rules=RULES)
+    end_of_day = events.drop_duplicates('Date', keep='last')[['Date'] + BALANCE_COLUMNS]
+    mid_month = end_of_day.assign(Date=pd.to_datetime(end_of_day['Date']) + pd.Timedelta(days=14))
+    mid_month['Date'] = mid_month['Date'].dt.strftime('%Y-%m-%d')
+    snapshots = pd.concat([start, end_of_day, mid_month], ignore_index=True)
+    snapshots[BALANCE_COLUMNS] = snapshots[BALANCE_COLUMNS].astype(float)
+    return snapshots.sort_values('Date', kind='stable').reset_index(drop=True)
+
+def test_perfect_rules_have_zero_error():
+    report = reconciliation_report(reconcile(perfect_snapshots(), RULES, months_ahead=3, tolerance_days=20))
+    for name in ('by_rule', 'by_account', 'by_month'):
+        assert not report[name].empty
+        assert (report[name]['mae'] == 0).all(), report[name]
+    assert set(report['by_rule'].index) == {rule['id'] for rule in RULES}
+
+def test_incremental_runs_match_single_run():
+    snapshots = perfect_snapshots()
+    snapshots.loc[snapshots['Date'] > '2024-03-01', 'ICICI (₹)'] += 250.0
+    full = reconcile(snapshots, RULES, months_ahead=3, tolerance_days=20)
+    state = reconcile(snapshots[snapshots['Date'] <= '2024-03-20'], RULES, months_ahead=3, tolerance_days=20)
+    state = reconcile(snapshots, RULES, state, months_ahead=3, tolerance_days=20)
+    assert state == full
@@ -0,0 +1,88 @@
+# Expansion of rule schedules by the compiled recurrence engine
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from recurrence import compile_rule, describe_rule, expand_rules, invalid_rules
+from prediction import generate_future_events
+
+def dates_of(rule, start='2024-01-01', end='2024-12-31'):
+    dates, _ = expand_rules([rule], start, end)
+    return [str(d) for d in dates]
+
+def test_fixed_day_clamps_to_short_months():
+    dates = dates_of({'day': 31})
+    assert dates[:4] == ['2024-01-31', '2024-02-29', '2024-03-31', '2024-04-30']
+    assert len(dates) == 12
+    assert dates_of({'day': 30, 'month': 2}, '2023-01-01', '2024-12-31') == ['2023-02-28', '2024-02-29']
+
+def test_last_and_last_business_day():
+    assert dates_of({'day_type': 'last'}, '2024-01-01', '2024-03-31') == ['2024-01-31', '2024-02-29', '2024-03-31']
+    # 2024-03-31 is a Sunday and 2024-08-31 a Saturday
+    dates = dates_of({'day_type': 'last_business'})
+    assert dates[2] == '2024-03-29'
+    assert dates[7] == '2024-08-30'
+    assert all(np.is_busday(np.array(dates, dtype='datetime64[D]')))
+
+def test_weekly_and_biweekly_phase_from_start_date():
+    # 2024-01-03 is a Wednesday
+    assert dates_of({'frequency': 'weekly', 'weekday': 4}, '2024-01-01', '2024-01-31') == [
+        '2024-01-05', '2024-01-12', '2024-01-19', '2024-01-26']
+    biweekly = {'frequency': 'biweekly', 'start_date': '2024-01-03'}
+    assert dates_of(biweekly, '2024-01-01', '2024-02-29') == [
+        '2024-01-03', '2024-01-17', '2024-01-31', '2024-02-14', '2024-02-28']
+    # The phase does not depend on the window being expanded
+    assert dates_of(biweekly, '2024-02-01', '2024-02-29') == ['2024-02-14', '2024-02-28']
+    assert dates_of({'frequency': 'weekly', 'interval': 3, 'weekday': 0, 'start_date': '2024-01-03'},
+                    '2024-01-01', '2024-02-29') == ['2024-01-08', '2024-01-29', '2024-02-19']
+
+def test_every_n_months_phase_from_start_date():
+    rule = {'frequency': 'every_n_months', 'interval': 3, 'day': 15, 'start_date': '2024-02-20'}
+    # February's occurrence falls before the start date
+    assert dates_of(rule) == ['2024-05-15', '2024-08-15', '2024-11-15']
+    assert dates_of(rule, '2025-01-01', '2025-12-31') == ['2025-02-15', '2025-05-15', '2025-08-15', '2025-11-15']
+
+def test_start_and_end_bounds():
+    rule = {'day': 10, 'start_date': '2024-03-10', 'end_date': '2024-06-09'}
+    assert dates_of(rule) == ['2024-03-10', '2024-04-10', '2024-05-10']
+    assert dates_of(rule, '2024-04-11', '2024-12-31') == ['2024-05-10']
+    assert dates_of({'day': 10, 'start_date': '2025-01-01'}) == []
+
+def test_same_day_events_ordered_by_date_then_rule():
+    rules = [{'day': 15}, {'frequency': 'weekly', 'weekday': 0}, {'day': 1}]
+    dates, rule_indices = expand_rules(rules, '2024-01-01', '2024-01-31')
+    assert list(dates) == sorted(dates)
+    # 2024-01-01 and 2024-01-15 are Mondays
+    first_day = [int(i) for d, i in zip(dates, rule_indices) if str(d) == '2024-01-01']
+    assert first_day == [1, 2]
+    mid_month = [int(i) for d, i in zip(dates, rule_indices) if str(d) == '2024-01-15']
+    assert mid_month == [0, 1]
+
+def test_monthly_ignores_interval():
+    assert compile_rule({'frequency': 'monthly', 'interval': 3})[1] == 1
+    assert len(dates_of({'frequency': 'monthly', 'interval': 3, 'day': 5})) == 12
+    assert describe_rule({'frequency': 'monthly', 'interval': 3, 'day': 5}) == 'Every 5 of the month'
+
+def test_repeating_schedules_need_a_start_date():
+    for rule in ({'frequency': 'every_n_months', 'interval': 2}, {'frequency': 'biweekly'},
+                 {'frequency': 'weekly', 'interval': 2}):
+        with pytest.raises(ValueError):
+            compile_rule(rule)
+
+def test_invalid_rules_are_skipped():
+    rules = [
+        {'id': 'ok', 'day': 1, 'account': 'HDFC (₹)', 'amount': 100, 'operation': 'add', 'description': 'ok'},
+        {'id': 'bad', 'day': 1, 'account': 'HDFC (₹)', 'amount': 100, 'operation': 'add', 'description': 'bad',
+         'frequency': 'every_n_months', 'interval': 2},
+    ]
+    assert set(invalid_rules(rules)) == {'bad'}
+    dates, rule_indices = expand_rules(rules, '2024-01-01', '2024-03-31')
+    assert len(dates) == 3 and set(rule_indices) == {0}
+    snapshot = pd.DataFrame([{'Date': '2023-12-31', 'HDFC (₹)': 0.0}])
+    # Three months from December: events on January 1 and February 1
+    events = generate_future_events(snapshot, 3, rules)
+    assert list(events['Rule ID']) == ['ok'] * 2